@@ -0,0 +1,365 @@
+import asyncio
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from html.parser import HTMLParser
+from importlib.util import find_spec
+from typing import AsyncIterator, Iterator, NamedTuple
+
+# BeautifulSoup and lxml are imported by their backends on first use, so
+# startup does not pay for a parser that is not configured.
+HAS_LXML = find_spec("lxml") is not None  # lxml is an optional speedup
+
+
+class ChatRow(NamedTuple):
+    """
+    A raw row of the HLstats chat table.
+
+    Attributes:
+        date (str): The in-game date of the message.
+        text (str): The message text.
+        map (str): The map the message was sent on.
+        user_name (str): The player name.
+        user_href (str): The player page link, relative to the site.
+        country_code (str): The lower-case flag code of the player, or an empty string.
+    """
+    date: str
+    text: str
+    map: str
+    user_name: str
+    user_href: str
+    country_code: str
+
+
+def _flag_code(src: None | str) -> str:
+    if not src:
+        return ""
+    return src.split("/")[-1].split(".")[0]
+
+
+class ParserBackend:
+    """
+    Base class of the chat table parsers.
+
+    A backend turns the chat page HTML into :class:`ChatRow` tuples,
+    newest message first, skipping the table header.
+    """
+    name: str
+
+    def parse(self, html: str) -> Iterator[ChatRow]:
+        raise NotImplementedError
+
+    async def parse_stream(self, chunks: AsyncIterator[str]) -> AsyncIterator[ChatRow]:
+        """
+        Parse a page received in chunks.
+
+        Tree-building backends wait for the whole page.
+
+        Args:
+            chunks: The page text, in order.
+
+        Yields:
+            ChatRow: The table rows.
+        """
+        html = "".join([chunk async for chunk in chunks])
+        if not html.strip():
+            return
+
+        for row in self.parse(html):
+            yield row
+
+
+class SoupBackend(ParserBackend):
+    """
+    Reference parser built on BeautifulSoup with the ``html.parser`` builder.
+    """
+    name = "soup"
+
+    def parse(self, html: str) -> Iterator[ChatRow]:
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(html, "html.parser")
+        table = soup.find("table", class_="data-table")
+        if table is None:
+            return
+
+        for row in table.find_all("tr")[1:]:
+            cells = row.find_all("td")
+            link = row.find("a")
+            image = row.find("img")
+
+            yield ChatRow(
+                date=cells[0].text.strip(),
+                text=cells[2].text.strip(),
+                map=cells[4].text.strip(),
+                user_name=link.text.strip() if link else "",
+                user_href=link.get("href", "") if link else "",
+                country_code=_flag_code(image.get("src") if image else None),
+            )
+
+
+class LxmlBackend(ParserBackend):
+    """
+    Parser built on the lxml C library, available when lxml is installed.
+    """
+    name = "lxml"
+
+    def parse(self, html: str) -> Iterator[ChatRow]:
+        if not html.strip():
+            return  # lxml refuses an empty document
+
+        from lxml import html as lxml_html
+
+        tables = lxml_html.fromstring(html).find_class("data-table")
+        if not tables:
+            return
+
+        for row in list(tables[0].iter("tr"))[1:]:
+            cells = row.findall(".//td")
+            link = row.find(".//a")
+            image = row.find(".//img")
+
+            yield ChatRow(
+                date=cells[0].text_content().strip(),
+                text=cells[2].text_content().strip(),
+                map=cells[4].text_content().strip(),
+                user_name=link.text_content().strip() if link is not None else "",
+                user_href=link.get("href", "") if link is not None else "",
+                country_code=_flag_code(image.get("src") if image is not None else None),
+            )
+
+
+class _ChatTableParser(HTMLParser):
+    """
+    Event-driven reader of the chat table that collects rows without building a tree.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.rows: list[ChatRow] = []
+        self._depth = 0  # depth of nested tables inside the chat table
+        self._seen_header = False
+        self._row: None | dict = None
+        self._cell: None | list[str] = None
+        self._link: None | list[str] = None
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        if self._depth == 0:
+            if tag == "table" and "data-table" in (dict(attrs).get("class") or "").split():
+                self._depth = 1
+            return
+
+        match tag:
+            case "table":
+                self._depth += 1
+            case "tr":
+                self._end_row()
+                self._row = {"cells": [], "href": None, "name": None, "src": None}
+            case "td" if self._row is not None:
+                self._end_cell()
+                self._cell = []
+            case "a" if self._row is not None and self._row["href"] is None:
+                self._row["href"] = dict(attrs).get("href") or ""
+                self._link = []
+            case "img" if self._row is not None and self._row["src"] is None:
+                self._row["src"] = dict(attrs).get("src") or ""
+
+    def handle_endtag(self, tag: str) -> None:
+        if self._depth == 0:
+            return
+
+        match tag:
+            case "table":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._end_row()
+            case "tr":
+                self._end_row()
+            case "td":
+                self._end_cell()
+            case "a" if self._link is not None:
+                self._row["name"] = "".join(self._link)
+                self._link = None
+
+    def handle_data(self, data: str) -> None:
+        if self._cell is not None:
+            self._cell.append(data)
+        if self._link is not None:
+            self._link.append(data)
+
+    def _end_cell(self) -> None:
+        if self._cell is not None:
+            self._row["cells"].append("".join(self._cell))
+            self._cell = None
+
+    def _end_row(self) -> None:
+        if self._row is None:
+            return
+
+        self._end_cell()
+        if self._link is not None:
+            self._row["name"] = "".join(self._link)
+            self._link = None
+
+        row, self._row = self._row, None
+        if not self._seen_header:
+            self._seen_header = True
+            return
+
+        cells = row["cells"]
+        self.rows.append(
+            ChatRow(
+                date=cells[0].strip(),
+                text=cells[2].strip(),
+                map=cells[4].strip(),
+                user_name=(row["name"] or "").strip(),
+                user_href=row["href"] or "",
+                country_code=_flag_code(row["src"]),
+            )
+        )
+
+
+class StreamingBackend(ParserBackend):
+    """
+    Pure-Python parser that reads the chat table with :class:`html.parser.HTMLParser`
+    and emits rows while it goes, without building a document tree.
+
+    Attributes:
+        CHUNK_SIZE (int): The number of characters fed to the parser at once.
+    """
+    name = "stream"
+    CHUNK_SIZE = 8192
+
+    def parse(self, html: str) -> Iterator[ChatRow]:
+        parser = _ChatTableParser()
+
+        for start in range(0, len(html), self.CHUNK_SIZE):
+            parser.feed(html[start:start + self.CHUNK_SIZE])
+            yield from parser.rows
+            parser.rows.clear()
+
+        parser.close()
+        yield from parser.rows
+
+    async def parse_stream(self, chunks: AsyncIterator[str]) -> AsyncIterator[ChatRow]:
+        """
+        Parse a page received in chunks, yielding each row as soon as it is complete,
+        so parsing overlaps with receiving the rest of the page.
+
+        Args:
+            chunks: The page text, in order.
+
+        Yields:
+            ChatRow: The table rows.
+        """
+        parser = _ChatTableParser()
+
+        async for chunk in chunks:
+            parser.feed(chunk)
+            for row in parser.rows:
+                yield row
+            parser.rows.clear()
+
+        parser.close()
+        for row in parser.rows:
+            yield row
+
+
+class ExecutorBackend(ParserBackend):
+    """
+    Runs another backend in an executor, so parsing a big page does not
+    block the event loop.
+
+    The whole page is received first and parsed at once; the rows are sent
+    back as plain tuples, which pickle compactly from a process pool.
+    """
+    name = "executor"
+
+    def __init__(self, backend: ParserBackend, executor: Executor) -> None:
+        """
+        Args:
+            backend: The backend doing the parsing.
+            executor: The thread or process pool to parse in.
+        """
+        self.backend = backend
+        self.executor = executor
+
+    def parse(self, html: str) -> Iterator[ChatRow]:
+        return self.backend.parse(html)
+
+    async def parse_stream(self, chunks: AsyncIterator[str]) -> AsyncIterator[ChatRow]:
+        html = "".join([chunk async for chunk in chunks])
+        if not html.strip():
+            return
+
+        rows = await asyncio.get_running_loop().run_in_executor(self.executor, _parse_rows, self.backend.name, html)
+        for row in rows:
+            yield ChatRow._make(row)
+
+
+@lru_cache
+def _cached_backend(name: str) -> ParserBackend:
+    return get_backend(name)
+
+
+def _parse_rows(name: str, html: str) -> list[tuple[str, ...]]:
+    return [tuple(row) for row in _cached_backend(name).parse(html)]
+
+
+def create_executor(kind: str, workers: int) -> Executor:
+    """
+    Create the pool of an :class:`ExecutorBackend`.
+
+    Processes are spawned rather than forked from the running event loop.
+
+    Args:
+        kind: ``process`` or ``thread``.
+        workers: The number of workers.
+
+    Returns:
+        Executor: The pool, to be shut down on exit.
+    """
+    match kind:
+        case "process":
+            import multiprocessing
+
+            return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+        case "thread":
+            return ThreadPoolExecutor(workers, thread_name_prefix="parser")
+        case _:
+            raise ValueError(f"Parser executor {kind} is not supported.")
+
+
+BACKENDS: dict[str, type[ParserBackend]] = {
+    backend.name: backend for backend in (SoupBackend, LxmlBackend, StreamingBackend)
+}
+
+
+def available_backends() -> list[str]:
+    """
+    List the names of the backends usable in this environment.
+
+    Returns:
+        list: The backend names.
+    """
+    return [name for name in BACKENDS if name != "lxml" or HAS_LXML]
+
+
+def get_backend(name: str = "auto") -> ParserBackend:
+    """
+    Get a parser backend by name.
+
+    Args:
+        name: One of ``soup``, ``lxml``, ``stream`` or ``auto``.
+              ``auto`` picks lxml if installed, the streaming parser otherwise.
+
+    Returns:
+        ParserBackend: The backend instance.
+    """
+    if name == "auto":
+        name = "lxml" if HAS_LXML else "stream"
+
+    if name not in available_backends():
+        raise ValueError(f"Parser backend {name} is not available.")
+
+    return BACKENDS[name]()
@@ -0,0 +1,72 @@
+"""
+Measure the cost of filtering a 500-row chat page against the cursor.
+
+Compares the original filter, which ran ``strptime`` on every message and on
+the stored cursor every tick, with the cursor comparing timestamps computed
+once at parse time.
+
+Usage:
+    python -m benchmarks.bench_filter
+"""
+import timeit
+
+from datetime import datetime, timedelta
+
+from parser import ChatMessage, Cursor, parse_timestamp
+
+ROWS = 500
+NUMBER = 200
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def make_messages() -> list[ChatMessage]:
+    start = datetime(2023, 6, 20, 8, 0, 51)
+    messages = []
+
+    for number in range(ROWS):
+        date = (start - timedelta(seconds=number * 3)).strftime(DATE_FORMAT)
+        messages.append(
+            ChatMessage(
+                map="c1m1_hotel",
+                date=date,
+                text=f"message {number}",
+                user_name="Player",
+                user_link=f"https://example.com/stats/hlstats.php?mode=playerinfo&player={number}",
+                user_country="🇷🇺",
+                timestamp=parse_timestamp(date),
+            )
+        )
+
+    return messages
+
+
+def main() -> None:
+    messages = make_messages()
+    last_date = messages[ROWS // 2].date
+
+    def strptime_filter() -> list[ChatMessage]:
+        cursor = datetime.strptime(last_date, DATE_FORMAT)
+        return [message for message in messages if datetime.strptime(message.date, DATE_FORMAT) > cursor]
+
+    cursor = Cursor(date=last_date)
+
+    def timestamp_filter() -> list[ChatMessage]:
+        return [message for message in messages if not cursor.behind(message) and message.key not in cursor.seen]
+
+    assert strptime_filter() == timestamp_filter()
+
+    for name, function in (("strptime", strptime_filter), ("timestamp", timestamp_filter)):
+        seconds = timeit.timeit(function, number=NUMBER)
+        print(f"{name:>10} filter: {seconds / NUMBER * 1e6:8.1f} us per {ROWS}-row page")
+
+    dates = [message.date for message in messages]
+    for name, function in (
+            ("strptime", lambda: [datetime.strptime(date, DATE_FORMAT) for date in dates]),
+            ("parse_timestamp", lambda: [parse_timestamp(date) for date in dates]),
+    ):
+        seconds = timeit.timeit(function, number=NUMBER)
+        print(f"{name:>15} parse: {seconds / NUMBER * 1e6:8.1f} us per {ROWS} dates")
+
+
+if __name__ == "__main__":
+    main()
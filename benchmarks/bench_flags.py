@@ -0,0 +1,63 @@
+"""
+Compare the import time and the per-row flag lookup cost of the full
+``countries`` table and the compact ``flags`` module.
+
+Usage:
+    python -m benchmarks.bench_flags
+"""
+import subprocess
+import sys
+import time
+import timeit
+
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+RUNS = 20
+NUMBER = 100_000
+CODES = ["RU", "UA", "KZ", "US", "DE", "XX"]
+
+
+def import_time(module: str) -> float:
+    """
+    Measure the best wall time of a fresh interpreter importing a module,
+    minus the interpreter startup time.
+    """
+
+    def best(code: str) -> float:
+        timings = []
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    return best(f"import {module}") - best("pass")
+
+
+def lookup(get_emoji) -> None:
+    for code in CODES:
+        try:
+            get_emoji(code)
+        except Exception:  # noqa
+            pass
+
+
+def main() -> None:
+    from countries import Country
+    import flags
+
+    for module in ("countries", "flags"):
+        print(f"import {module:>9}: {import_time(module) * 1000:6.2f} ms")
+
+    lookups = (
+        ("Country.get().emoji", lambda code: Country.get(code).emoji),
+        ("flags.get_emoji", flags.get_emoji),
+    )
+    for name, get_emoji in lookups:
+        seconds = timeit.timeit(lambda: lookup(get_emoji), number=NUMBER)
+        print(f"{name:>19}: {seconds / NUMBER / len(CODES) * 1e9:6.0f} ns per row")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Compare the chat parser backends on a saved HLstats chat page.
+
+Every available backend must produce exactly the rows of the BeautifulSoup
+reference backend; the script fails otherwise.
+
+Usage:
+    python -m benchmarks.bench_parsers [fixture.html]
+"""
+import sys
+import timeit
+
+from pathlib import Path
+
+from backends import available_backends, get_backend
+
+FIXTURE = Path(__file__).parent / "fixtures" / "chat.html"
+REPEAT = 5
+NUMBER = 20
+
+
+def main() -> None:
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else FIXTURE
+    html = path.read_text(encoding="utf-8")
+
+    reference = list(get_backend("soup").parse(html))
+    print(f"{path.name}: {len(html)} chars, {len(reference)} rows")
+
+    for name in available_backends():
+        backend = get_backend(name)
+        rows = list(backend.parse(html))
+        assert rows == reference, f"backend {name} differs from the reference"
+
+        best = min(timeit.repeat(lambda: list(backend.parse(html)), repeat=REPEAT, number=NUMBER))
+        print(f"{name:>8}: {best / NUMBER * 1000:8.2f} ms per page")
+
+
+if __name__ == "__main__":
+    main()
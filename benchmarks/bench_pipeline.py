@@ -0,0 +1,225 @@
+"""
+Measure the poll-to-delivery pipeline end to end against local stand-ins
+for the HLstats server and the Telegram Bot API.
+
+Every round polls a fresh feed of a chat page of the given size, so all
+rows are new, and waits until the sender workers delivered them. Prints
+one JSON object per page size:
+
+- ``msgs_per_sec``: delivered messages per second over all chats, polling included;
+- ``poll_p50_ms`` / ``poll_p99_ms``: time taken by ``send_new_message``,
+  i.e. ``parse_chat`` plus queueing with ``send_messages``;
+- ``delivery_p50_ms`` / ``delivery_p99_ms``: time from the start of the
+  poll until a message is accepted by the Bot API;
+- ``loop_stall_max_ms``: the longest delay of a 1 ms timer, i.e. how long
+  the event loop was blocked, e.g. by parsing.
+
+With ``--trace``, spans are exported to a local OTLP collector stand-in
+and their number is reported as ``spans``.
+
+Usage:
+    python -m benchmarks.bench_pipeline [--sizes 50 500 5000] [--rounds 5] [--batch] [--executor process]
+                                        [--output results.json]
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+from dataclasses import replace
+
+from aiogram import Bot
+from aiogram.bot.api import TelegramAPIServer
+
+from backends import ExecutorBackend, create_executor, get_backend
+from config import Source, Target, load_config
+from limiter import RateLimiter
+from main import create_feed, send_new_message
+from session import create_session
+from storage import create_store
+from tracing import OtlpExporter, tracer
+
+from benchmarks.pages import SIZES, make_page
+from benchmarks.servers import FakeBotApi, FakeCollector, hlstats_app, start_app
+
+TOKEN = "123456:BENCHMARK"
+UNLIMITED = 10 ** 9
+
+
+async def watch_loop(stalls: list[float], interval: float = 0.001) -> None:
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - started - interval)
+
+
+def percentile(values: list[float], percent: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+async def bench_size(
+        size: int,
+        rounds: int,
+        targets: int,
+        base_url: str,
+        bot: Bot,
+        bot_api: FakeBotApi,
+        pages: dict,
+) -> dict:
+    loop = asyncio.get_running_loop()
+    config = loop.__getattribute__("config")
+    store = loop.__getattribute__("store")
+    limiter = RateLimiter(rate=UNLIMITED, chat_rate=UNLIMITED, chat_burst=UNLIMITED)
+
+    html = make_page(size)
+    polls, deliveries, stalls = [], [], []
+    elapsed = 0.0
+    watcher = asyncio.create_task(watch_loop(stalls))
+
+    for number in range(rounds):
+        game = f"bench{size}r{number}"
+        pages[game] = html
+
+        source = Source(base_url, game, targets=[Target(-100 - target) for target in range(targets)])
+        feed = create_feed(source, bot, limiter, store, config)
+        workers = []
+
+        for outlet in feed.outlets:
+            def record(messages: list, on_delivered=outlet.deliveries.on_delivered) -> None:
+                latency = time.perf_counter() - started
+                deliveries.extend(latency for _ in messages)
+                on_delivered(messages)
+
+            outlet.deliveries.on_delivered = record
+            workers.extend(asyncio.create_task(outlet.deliveries.worker()) for _ in range(config.SENDER_WORKERS))
+
+        started = time.perf_counter()
+        await send_new_message(feed)
+        polls.append(time.perf_counter() - started)
+        await asyncio.gather(*(outlet.deliveries.join() for outlet in feed.outlets))
+        elapsed += time.perf_counter() - started
+
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        del pages[game]
+
+    watcher.cancel()
+    await tracer.flush()
+    messages = len(deliveries)
+    return {
+        "benchmark": "pipeline",
+        "rows": size,
+        "rounds": rounds,
+        "backend": config.PARSER_BACKEND,
+        "executor": config.PARSER_EXECUTOR,
+        "batch": config.BATCH_MESSAGES,
+        "workers": config.SENDER_WORKERS,
+        "targets": targets,
+        "messages": messages,
+        "requests": len(bot_api.received),
+        "seconds": round(elapsed, 6),
+        "msgs_per_sec": round(messages / elapsed, 1) if elapsed else 0.0,
+        "poll_p50_ms": round(percentile(polls, 50) * 1000, 3),
+        "poll_p99_ms": round(percentile(polls, 99) * 1000, 3),
+        "delivery_p50_ms": round(percentile(deliveries, 50) * 1000, 3),
+        "delivery_p99_ms": round(percentile(deliveries, 99) * 1000, 3),
+        "loop_stall_max_ms": round(max(stalls, default=0.0) * 1000, 3),
+        "trace": tracer.enabled,
+    }
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    os.environ.setdefault("TOKEN", TOKEN)
+    os.environ.setdefault("GROUP_ID", "-100")
+    os.environ.setdefault("LIVE_CHAT_ID", "1")
+    config = replace(
+        load_config(),
+        PARSER_BACKEND=args.backend,
+        PARSER_EXECUTOR=args.executor,
+        PARSER_WORKERS=args.parser_workers,
+        BATCH_MESSAGES=args.batch,
+        SENDER_WORKERS=args.workers,
+        BACKFILL_PAGES=1,
+        QUEUE_SIZE=0,  # every poll queues all of its rows
+    )
+
+    pages: dict[str, str] = {}
+    bot_api = FakeBotApi(latency=args.bot_latency)
+    hlstats_runner, hlstats_url = await start_app(hlstats_app(pages))
+    bot_runner, bot_url = await start_app(bot_api.app())
+
+    bot = Bot(TOKEN, parse_mode="HTML", server=TelegramAPIServer.from_base(bot_url))
+    session = create_session()
+
+    collector = FakeCollector()
+    collector_runner = None
+    if args.trace:
+        collector_runner, collector_url = await start_app(collector.app())
+        tracer.exporter = OtlpExporter(f"{collector_url}/v1/traces", session)
+
+    backend = get_backend(config.PARSER_BACKEND)
+    executor = None
+    if config.PARSER_EXECUTOR != "none":
+        executor = create_executor(config.PARSER_EXECUTOR, config.PARSER_WORKERS)
+        backend = ExecutorBackend(backend, executor)
+
+    loop = asyncio.get_running_loop()
+    loop.__setattr__("config", config)
+    loop.__setattr__("session", session)
+    loop.__setattr__("backend", backend)
+    loop.__setattr__("backfill", asyncio.Semaphore(1))
+    loop.__setattr__("store", create_store("sqlite", ":memory:"))
+
+    results = []
+    try:
+        for size in args.sizes:
+            bot_api.received.clear()
+            collector.spans.clear()
+            result = await bench_size(size, args.rounds, args.targets, hlstats_url, bot, bot_api, pages)
+            if args.trace:
+                result["spans"] = len(collector.spans)
+            print(json.dumps(result), flush=True)
+            results.append(result)
+    finally:
+        loop.__getattribute__("store").close()
+        if executor:
+            executor.shutdown()
+        await session.close()
+        await (await bot.get_session()).close()
+        await bot_runner.cleanup()
+        await hlstats_runner.cleanup()
+        if collector_runner:
+            await collector_runner.cleanup()
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="rows per chat page")
+    parser.add_argument("--rounds", type=int, default=5, help="polls per page size")
+    parser.add_argument("--backend", default="auto", help="parser backend")
+    parser.add_argument("--executor", default="none", help="parse in a thread or process pool")
+    parser.add_argument("--parser-workers", type=int, default=2, help="workers of the parser pool")
+    parser.add_argument("--batch", action="store_true", help="pack messages into batches")
+    parser.add_argument("--workers", type=int, default=1, help="sender workers per chat")
+    parser.add_argument("--targets", type=int, default=1, help="chats every message is sent to")
+    parser.add_argument("--bot-latency", type=float, default=0.0, help="Bot API response time, in seconds")
+    parser.add_argument("--trace", action="store_true", help="export spans to a local OTLP collector")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Measure how long a fresh bot process takes to import its modules and to
+finish its first poll of a local HLstats stand-in.
+
+Every run starts a new interpreter that imports ``main`` and polls a
+500-row page once. A separate ``-X importtime`` run lists the modules that
+cost the most. Prints one JSON object:
+
+- ``import_ms``: median time from spawning the process until ``main`` is imported;
+- ``first_poll_ms``: median time from spawning the process until the first poll is parsed;
+- ``main_import_us``: the cumulative import time of ``main`` reported by ``-X importtime``;
+- ``slowest_imports``: the modules with the highest self import time.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 5] [--event-loop uvloop] [--output results.json]
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import subprocess
+
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+ROWS = 500
+TOP = 15
+
+
+def child(url: str, spawned: float, event_loop: str) -> None:
+    import main
+    imported = time.time()
+
+    from parser import parse_chat
+    from session import create_session
+
+    main.install_event_loop(event_loop)
+
+    async def poll() -> int:
+        session = create_session()
+        asyncio.get_running_loop().__setattr__("session", session)
+        try:
+            return len([message async for message in parse_chat(url, "l4d")])
+        finally:
+            await session.close()
+
+    rows = asyncio.run(poll())
+    polled = time.time()
+
+    print(json.dumps({"import_ms": (imported - spawned) * 1000, "first_poll_ms": (polled - spawned) * 1000, "rows": rows}))
+
+
+def import_profile() -> tuple[int, list[dict]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append({"module": name.strip(), "self_us": int(self_us), "cumulative_us": int(cumulative_us)})
+
+    main_us = next((item["cumulative_us"] for item in imports if item["module"] == "main"), 0)
+    return main_us, sorted(imports, key=lambda item: item["self_us"], reverse=True)[:TOP]
+
+
+async def run(args: argparse.Namespace) -> dict:
+    from benchmarks.pages import make_page
+    from benchmarks.servers import hlstats_app, start_app
+
+    runner, url = await start_app(hlstats_app({"l4d": make_page(ROWS)}))
+
+    runs = []
+    try:
+        for _ in range(args.runs):
+            spawned = time.time()
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, "-m", "benchmarks.bench_startup",
+                "--child", url, str(spawned), "--event-loop", args.event_loop,
+                cwd=ROOT, stdout=subprocess.PIPE,
+            )
+            stdout, _ = await process.communicate()
+            if process.returncode:
+                raise RuntimeError(f"The startup run failed with code {process.returncode}")
+            runs.append(json.loads(stdout.decode().splitlines()[-1]))
+    finally:
+        await runner.cleanup()
+
+    main_us, slowest = import_profile()
+    return {
+        "benchmark": "startup",
+        "runs": args.runs,
+        "event_loop": args.event_loop,
+        "rows": runs[0]["rows"],
+        "import_ms": round(statistics.median(run["import_ms"] for run in runs), 1),
+        "first_poll_ms": round(statistics.median(run["first_poll_ms"] for run in runs), 1),
+        "main_import_us": main_us,
+        "slowest_imports": slowest,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="processes to start")
+    parser.add_argument("--event-loop", default="asyncio", help="asyncio or uvloop")
+    parser.add_argument("--output", help="also write the result to this JSON file")
+    parser.add_argument("--child", nargs=2, metavar=("URL", "SPAWNED"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], float(args.child[1]), args.event_loop)
+        return
+
+    result = asyncio.run(run(args))
+    print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Chat pages of any size built from the recorded HLstats page.
+
+The rows of ``fixtures/chat.html`` are repeated in order with descending,
+one second apart dates, so every row of a page is a distinct message.
+"""
+import re
+
+from datetime import datetime, timedelta
+from pathlib import Path
+
+FIXTURE = Path(__file__).parent / "fixtures" / "chat.html"
+SIZES = (50, 500, 5000)
+
+ROW_PATTERN = re.compile(r'<tr class="bg\d">.*?</tr>', re.S)
+DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def make_page(rows: int, start: datetime = datetime(2023, 6, 20, 8, 0, 0)) -> str:
+    """
+    Build a chat page from the recorded rows.
+
+    Args:
+        rows: The number of rows of the page.
+        start: The date of the newest row.
+
+    Returns:
+        str: The page HTML.
+    """
+    html = FIXTURE.read_text(encoding="utf-8")
+    recorded = ROW_PATTERN.findall(html)
+    head = html[:html.index(recorded[0])]
+    tail = html[html.index(recorded[-1]) + len(recorded[-1]):]
+
+    body = [
+        DATE_PATTERN.sub((start - timedelta(seconds=number)).strftime(DATE_FORMAT), recorded[number % len(recorded)], 1)
+        for number in range(rows)
+    ]
+    return head + "\n".join(body) + tail
@@ -0,0 +1,130 @@
+"""
+Local stand-ins for the HLstats server and the Telegram Bot API.
+"""
+import time
+import asyncio
+
+from aiohttp import web
+
+
+async def start_app(app: web.Application) -> tuple[web.AppRunner, str]:
+    """
+    Serve an application on a free local port.
+
+    Args:
+        app: The application.
+
+    Returns:
+        tuple: The runner, to be cleaned up, and the base URL.
+    """
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # noqa
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def hlstats_app(pages: dict[str, str]) -> web.Application:
+    """
+    Create an HLstats stand-in serving the first chat page of every game.
+
+    Older pages are empty.
+
+    Args:
+        pages: The page HTML of every game code.
+
+    Returns:
+        web.Application: The application.
+    """
+    async def chat(request: web.Request) -> web.Response:
+        html = pages.get(request.query.get("game"))
+        if html is None:
+            raise web.HTTPNotFound()
+        if request.query.get("page", "1") != "1":
+            html = ""
+        return web.Response(text=html, content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/stats/hlstats.php", chat)
+    return app
+
+
+class FakeBotApi:
+    """
+    Telegram Bot API stand-in accepting every ``sendMessage`` call.
+
+    Other methods, such as ``setWebhook``, are recorded and answered with ``true``.
+
+    Attributes:
+        latency (float): The time taken to answer a request, in seconds.
+        received (list[float]): The ``time.perf_counter`` of every accepted message.
+        calls (list[tuple[str, dict]]): The method and parameters of every other call.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.received: list[float] = []
+        self.calls: list[tuple[str, dict]] = []
+
+    def app(self) -> web.Application:
+        """
+        Create the application.
+
+        Returns:
+            web.Application: The application serving ``/bot{token}/{method}``.
+        """
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        data = await request.post()
+
+        if request.match_info["method"].lower() != "sendmessage":
+            self.calls.append((request.match_info["method"], dict(data)))
+            return web.json_response({"ok": True, "result": True})
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        self.received.append(time.perf_counter())
+        return web.json_response({
+            "ok": True,
+            "result": {
+                "message_id": len(self.received),
+                "date": int(time.time()),
+                "chat": {"id": int(data["chat_id"]), "type": "supergroup"},
+                "text": data["text"],
+            },
+        })
+
+
+class FakeCollector:
+    """
+    OpenTelemetry collector stand-in accepting OTLP/HTTP JSON traces.
+
+    Attributes:
+        spans (list[dict]): The received spans.
+    """
+
+    def __init__(self) -> None:
+        self.spans: list[dict] = []
+
+    def app(self) -> web.Application:
+        """
+        Create the application.
+
+        Returns:
+            web.Application: The application serving ``/v1/traces``.
+        """
+        app = web.Application()
+        app.router.add_post("/v1/traces", self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        for resource in body["resourceSpans"]:
+            for scope in resource["scopeSpans"]:
+                self.spans.extend(scope["spans"])
+        return web.json_response({"partialSuccess": {}})
@@ -0,0 +1,112 @@
+import time
+import logging
+
+from typing import Callable
+
+
+class CircuitBreaker:
+    """
+    A circuit breaker guarding requests to a single stats host.
+
+    After ``threshold`` consecutive failures the breaker opens and requests
+    are skipped. Once the backoff has passed, a single trial request is let
+    through: a success closes the breaker, a failure opens it again with a
+    doubled backoff.
+
+    Attributes:
+        CLOSED (str): Requests go through.
+        OPEN (str): Requests are skipped until the backoff has passed.
+        HALF_OPEN (str): A trial request is in progress.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+            self,
+            name: str,
+            threshold: int = 3,
+            base_delay: float = 5.0,
+            max_delay: float = 300.0,
+            clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            name: The name of the guarded source, used in logs.
+            threshold: The number of consecutive failures that opens the breaker.
+            base_delay: The first backoff, in seconds.
+            max_delay: The longest backoff, in seconds.
+            clock: A monotonic clock returning seconds.
+        """
+        self.name = name
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.total_failures = 0
+        self.delay = 0.0
+        self.retry_at = 0.0
+        self.last_error: None | str = None
+        self.last_success: None | float = None
+
+        self._clock = clock
+
+    def allow(self) -> bool:
+        """
+        Check whether a request may be made now.
+
+        Returns:
+            bool: False while the breaker is open.
+        """
+        if self.state == self.OPEN:
+            if self._clock() < self.retry_at:
+                return False
+            self.state = self.HALF_OPEN
+        return True
+
+    def success(self) -> None:
+        """
+        Record a successful request.
+        """
+        if self.state != self.CLOSED:
+            logging.info("Source %s recovered", self.name)
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.delay = 0.0
+        self.last_success = time.time()
+
+    def failure(self, error: str) -> None:
+        """
+        Record a failed request.
+
+        Args:
+            error: The error description.
+        """
+        self.failures += 1
+        self.total_failures += 1
+        self.last_error = error
+
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            self.delay = min(self.max_delay, self.delay * 2 if self.delay else self.base_delay)
+            self.retry_at = self._clock() + self.delay
+            self.state = self.OPEN
+            logging.warning("Source %s is failing (%s), retrying in %.0f s", self.name, error, self.delay)
+
+    def health(self) -> dict:
+        """
+        Get the health state for monitoring.
+
+        Returns:
+            dict: The breaker state.
+        """
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "total_failures": self.total_failures,
+            "retry_in": max(0.0, self.retry_at - self._clock()) if self.state == self.OPEN else 0.0,
+            "last_error": self.last_error,
+            "last_success": self.last_success,
+        }
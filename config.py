@@ -1,21 +1,170 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from environs import Env
 
 
+@dataclass
+class Target:
+    """
+    A Telegram chat the messages are mirrored to.
+
+    Attributes:
+        chat_id (int): The Telegram chat to send the messages to.
+        thread_id (int): The forum topic of the chat, if any.
+    """
+    chat_id: int
+    thread_id: None | int = None
+
+    @property
+    def name(self) -> str:
+        return str(self.chat_id) if self.thread_id is None else f"{self.chat_id}/{self.thread_id}"
+
+
+@dataclass
+class Source:
+    """
+    An HLstats chat page to monitor and the Telegram chats it is mirrored to.
+
+    Attributes:
+        base_url (str): The base URL of the HLstats site.
+        game (str): The HLstats game code.
+        targets (list[Target]): The chats to send the messages to.
+    """
+    base_url: str
+    game: str
+    targets: list[Target] = field(default_factory=list)
+
+    @property
+    def name(self) -> str:
+        return f"{self.base_url}/{self.game}"
+
+
 @dataclass
 class Config:
     TOKEN: str
     GROUP_ID: int
     LIVE_CHAT_ID: int
+    SOURCES: list[Source]
+    EVENT_LOOP: str  # asyncio or uvloop
+    PARSER_BACKEND: str
+    PARSER_EXECUTOR: str  # none, thread or process
+    PARSER_WORKERS: int
+    BATCH_MESSAGES: bool
+    GLOBAL_RATE_LIMIT: float  # messages per second
+    CHAT_RATE_LIMIT: float  # messages per minute to one chat
+    CHAT_BURST: int
+    QUEUE_SIZE: int
+    SENDER_WORKERS: int
+    POLL_INTERVAL_MIN: float  # seconds
+    POLL_INTERVAL_MAX: float  # seconds
+    STATE_BACKEND: str
+    STATE_FILE: str
+    STATE_FLUSH_INTERVAL: float  # seconds
+    BACKFILL_PAGES: int
+    BACKFILL_CONCURRENCY: int
+    MAX_PAGE_SIZE: int  # bytes
+    PAGE_ENCODING: str
+    FETCH_CONNECT_TIMEOUT: float  # seconds
+    FETCH_READ_TIMEOUT: float  # seconds
+    FETCH_TOTAL_TIMEOUT: float  # seconds
+    BREAKER_THRESHOLD: int
+    BREAKER_MAX_DELAY: float  # seconds
+    MONITORING_HOST: str
+    MONITORING_PORT: int
+    UPDATES_MODE: str  # polling, webhook or none
+    WEBHOOK_URL: str
+    WEBHOOK_HOST: str
+    WEBHOOK_PORT: int
+    WEBHOOK_PATH: str
+    WEBHOOK_SECRET: str
+    TRACE_EXPORTER: str  # none, jsonl or otlp
+    TRACE_FILE: str
+    TRACE_ENDPOINT: str
+    TRACE_EXPORT_INTERVAL: float  # seconds
+
+
+def load_targets(items: list[dict]) -> list[Target]:
+    return [Target(chat_id=item["chat_id"], thread_id=item.get("thread_id")) for item in items]
+
+
+def load_sources(env: Env, chat_id: int, thread_id: None | int) -> list[Source]:
+    """
+    Load the monitored sources from the SOURCES JSON list.
+
+    A source is sent to its own ``targets`` list, or to a single ``chat_id`` /
+    ``thread_id``. Other sources are sent to the TARGETS JSON list, which
+    defaults to GROUP_ID / LIVE_CHAT_ID.
+    Without SOURCES, the original single server is monitored.
+    """
+    default = '[{"base_url": "https://toma92.myarena.site", "game": "l4d"}]'
+    targets = load_targets(env.json("TARGETS", "[]")) or [Target(chat_id, thread_id)]
+
+    sources = []
+    for item in env.json("SOURCES", default):
+        if "targets" in item:
+            source_targets = load_targets(item["targets"])
+        elif "chat_id" in item:
+            source_targets = [Target(item["chat_id"], item.get("thread_id"))]
+        else:
+            source_targets = list(targets)
+
+        sources.append(
+            Source(
+                base_url=item["base_url"].rstrip("/"),
+                game=item.get("game", "l4d"),
+                targets=source_targets,
+            )
+        )
+
+    return sources
 
 
 def load_config() -> Config:
     env = Env()
     env.read_env()
 
+    group_id = env.int("GROUP_ID")
+    live_chat_id = env.int("LIVE_CHAT_ID")
+
     return Config(
         TOKEN=env.str("TOKEN"),
-        GROUP_ID=env.int("GROUP_ID"),
-        LIVE_CHAT_ID=env.int("LIVE_CHAT_ID"),
+        GROUP_ID=group_id,
+        LIVE_CHAT_ID=live_chat_id,
+        SOURCES=load_sources(env, group_id, live_chat_id),
+        EVENT_LOOP=env.str("EVENT_LOOP", "asyncio"),
+        PARSER_BACKEND=env.str("PARSER_BACKEND", "auto"),
+        PARSER_EXECUTOR=env.str("PARSER_EXECUTOR", "none"),
+        PARSER_WORKERS=env.int("PARSER_WORKERS", 2),
+        BATCH_MESSAGES=env.bool("BATCH_MESSAGES", False),
+        GLOBAL_RATE_LIMIT=env.float("GLOBAL_RATE_LIMIT", 30),
+        CHAT_RATE_LIMIT=env.float("CHAT_RATE_LIMIT", 20),
+        CHAT_BURST=env.int("CHAT_BURST", 3),
+        QUEUE_SIZE=env.int("QUEUE_SIZE", 100),
+        SENDER_WORKERS=env.int("SENDER_WORKERS", 1),
+        POLL_INTERVAL_MIN=env.float("POLL_INTERVAL_MIN", 1),
+        POLL_INTERVAL_MAX=env.float("POLL_INTERVAL_MAX", 60),
+        STATE_BACKEND=env.str("STATE_BACKEND", "json"),
+        STATE_FILE=env.str("STATE_FILE", "data.json"),
+        STATE_FLUSH_INTERVAL=env.float("STATE_FLUSH_INTERVAL", 5),
+        BACKFILL_PAGES=env.int("BACKFILL_PAGES", 10),
+        BACKFILL_CONCURRENCY=env.int("BACKFILL_CONCURRENCY", 4),
+        MAX_PAGE_SIZE=env.int("MAX_PAGE_SIZE", 4 * 1024 * 1024),
+        PAGE_ENCODING=env.str("PAGE_ENCODING", "utf-8"),
+        FETCH_CONNECT_TIMEOUT=env.float("FETCH_CONNECT_TIMEOUT", 10),
+        FETCH_READ_TIMEOUT=env.float("FETCH_READ_TIMEOUT", 20),
+        FETCH_TOTAL_TIMEOUT=env.float("FETCH_TOTAL_TIMEOUT", 60),
+        BREAKER_THRESHOLD=env.int("BREAKER_THRESHOLD", 3),
+        BREAKER_MAX_DELAY=env.float("BREAKER_MAX_DELAY", 300),
+        MONITORING_HOST=env.str("MONITORING_HOST", "127.0.0.1"),
+        MONITORING_PORT=env.int("MONITORING_PORT", 9090),
+        UPDATES_MODE=env.str("UPDATES_MODE", "polling"),
+        WEBHOOK_URL=env.str("WEBHOOK_URL", ""),
+        WEBHOOK_HOST=env.str("WEBHOOK_HOST", "127.0.0.1"),
+        WEBHOOK_PORT=env.int("WEBHOOK_PORT", 8080),
+        WEBHOOK_PATH=env.str("WEBHOOK_PATH", "/webhook"),
+        WEBHOOK_SECRET=env.str("WEBHOOK_SECRET", ""),
+        TRACE_EXPORTER=env.str("TRACE_EXPORTER", "none"),
+        TRACE_FILE=env.str("TRACE_FILE", "traces.jsonl"),
+        TRACE_ENDPOINT=env.str("TRACE_ENDPOINT", "http://127.0.0.1:4318/v1/traces"),
+        TRACE_EXPORT_INTERVAL=env.float("TRACE_EXPORT_INTERVAL", 5),
     )
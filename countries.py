@@ -1,8 +1,7 @@
 from dataclasses import dataclass
 
-
-class CountryNotFoundError(Exception):
-    ...
+import flags
+from flags import CountryNotFoundError
 
 
 @dataclass
@@ -41,7 +40,7 @@ class Country:
         :param code: country code in ISO 3166 format
         :return: :class:`CountryData`
         """
-        return cls.get(code).emoji
+        return flags.get_emoji(code)
 
     data = {
         "AD": {
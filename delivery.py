@@ -0,0 +1,281 @@
+import time
+import asyncio
+import logging
+
+from dataclasses import dataclass, field, replace
+from typing import Callable
+
+import aiohttp
+
+from aiogram import Bot
+from aiogram.utils.exceptions import (
+    BadRequest,
+    MigrateToChat,
+    NotFound,
+    RetryAfter,
+    TelegramAPIError,
+    Unauthorized,
+)
+
+import metrics
+from limiter import RateLimiter
+from parser import ChatMessage, local_timestamp
+from tracing import tracer
+
+MESSAGE_LIMIT = 4096
+BATCH_SEPARATOR = "\n\n"
+
+
+@dataclass
+class Delivery:
+    """
+    A Telegram message waiting to be sent.
+
+    Attributes:
+        text (str): The HTML text.
+        messages (list): The chat messages rendered in the text.
+        attempts (int): The number of failed sends.
+        queued (float): When the delivery was queued, in seconds since the epoch.
+    """
+    text: str
+    messages: list[ChatMessage] = field(default_factory=list)
+    attempts: int = 0
+    queued: float = 0.0
+
+
+def pack_messages(messages: list[ChatMessage], limit: int = MESSAGE_LIMIT) -> list[Delivery]:
+    """
+    Pack consecutive messages into as few deliveries as possible.
+
+    Texts are only split at message boundaries. The limit is applied to the
+    HTML length, which is never shorter than the length Telegram counts.
+
+    Args:
+        messages: The chat messages, in sending order.
+        limit: The maximum length of a packed text.
+
+    Returns:
+        list: The packed deliveries.
+    """
+    batches: list[Delivery] = []
+
+    for message in messages:
+        text = message.rendered_html
+        if batches and len(batches[-1].text) + len(BATCH_SEPARATOR) + len(text) <= limit:
+            batches[-1].text += BATCH_SEPARATOR + text
+            batches[-1].messages.append(message)
+        else:
+            batches.append(Delivery(text=text, messages=[message]))
+
+    return batches
+
+
+def prepare_deliveries(messages: list[ChatMessage], batch: bool = False) -> list[Delivery]:
+    """
+    Render messages into deliveries, to be queued for one or more chats.
+
+    Args:
+        messages: The chat messages, in sending order.
+        batch: Pack consecutive messages into a single Telegram message.
+
+    Returns:
+        list: The deliveries.
+    """
+    if batch:
+        return pack_messages(messages)
+    return [Delivery(text=message.rendered_html, messages=[message]) for message in messages]
+
+
+class DeliveryQueue:
+    """
+    Bounded queue of chat messages drained by sender workers with at-least-once semantics.
+
+    A worker keeps a delivery until Telegram accepts it: flood errors wait for
+    the rate limiter, network errors, Telegram server errors and unexpected
+    errors are retried with exponential backoff.
+    Only requests Telegram rejects as invalid, or for a chat the bot cannot
+    write to, are dropped, since resending them cannot succeed. The ``on_delivered`` callback runs in queue order
+    once a delivery and all deliveries before it are done with, so a cursor
+    advanced there never skips a message that could still be sent.
+
+    With more than one worker, messages may reach the chat out of order.
+
+    Attributes:
+        BASE_DELAY (float): The backoff after the first network error, in seconds.
+        MAX_DELAY (float): The maximum backoff, in seconds.
+    """
+    BASE_DELAY = 1.0
+    MAX_DELAY = 60.0
+
+    def __init__(
+            self,
+            bot: Bot,
+            limiter: RateLimiter,
+            chat_id: int,
+            thread_id: None | int,
+            on_delivered: Callable[[list[ChatMessage]], None],
+            maxsize: int = 0,
+    ) -> None:
+        self.bot = bot
+        self.limiter = limiter
+        self.chat_id = chat_id
+        self.thread_id = thread_id
+        self.on_delivered = on_delivered
+
+        self._queue: asyncio.Queue[tuple[int, Delivery]] = asyncio.Queue(maxsize)
+        self._next_put = 0
+        self._next_done = 0
+        self._done: dict[int, Delivery] = {}
+
+    @property
+    def depth(self) -> int:
+        """
+        The number of deliveries waiting for a worker.
+        """
+        return self._queue.qsize()
+
+    def put_nowait(self, deliveries: list[Delivery]) -> int:
+        """
+        Queue as many deliveries as there is room for, without waiting.
+
+        The deliveries are copied, so the same ones can be queued for several chats.
+
+        Args:
+            deliveries: The deliveries, in sending order.
+
+        Returns:
+            int: The number of deliveries queued, from the first one on.
+        """
+        for number, delivery in enumerate(deliveries):
+            if self._queue.full():
+                metrics.QUEUE_FULL.inc(len(deliveries) - number, chat=self.chat_id)
+                logging.warning(
+                    "Delivery queue of chat %s is full (%d), %d deliveries are left for a later poll",
+                    self.chat_id, self._queue.maxsize, len(deliveries) - number,
+                )
+                return number
+
+            self._queue.put_nowait((self._next_put, replace(delivery, queued=time.time())))
+            self._next_put += 1
+            metrics.DELIVERIES_QUEUED.inc(chat=self.chat_id)
+
+        return len(deliveries)
+
+    async def worker(self) -> None:
+        """
+        Take deliveries from the queue and send them until cancelled.
+        """
+        while True:
+            number, delivery = await self._queue.get()
+            if tracer.enabled:
+                self._trace(delivery, "queue", delivery.queued, time.time())
+            try:
+                while not await self.send(delivery):
+                    metrics.SEND_RETRIES.inc(chat=self.chat_id)
+                self._complete(number, delivery)
+            finally:
+                self._queue.task_done()
+
+    async def join(self) -> None:
+        """
+        Wait until every queued delivery is done with.
+        """
+        await self._queue.join()
+
+    def _complete(self, number: int, delivery: Delivery) -> None:
+        metrics.DELIVERIES_DONE.inc(chat=self.chat_id)
+        self._done[number] = delivery
+
+        while self._next_done in self._done:
+            self.on_delivered(self._done.pop(self._next_done).messages)
+            self._next_done += 1
+
+    def _trace(self, delivery: Delivery, name: str, start: float, end: float, **attributes) -> None:
+        for message in delivery.messages:
+            tracer.record(
+                message.trace_id, name, start, end,
+                chat_id=self.chat_id, thread_id=self.thread_id or 0, **attributes,
+            )
+
+    async def send(self, delivery: Delivery) -> bool:
+        """
+        Make a single attempt to send a delivery.
+
+        Args:
+            delivery: The delivery to send.
+
+        Returns:
+            bool: True if the delivery is done with, False if it must be retried.
+        """
+        waited = time.time()
+        await self.limiter.acquire(self.chat_id)
+        if tracer.enabled:
+            self._trace(delivery, "rate_limit", waited, time.time(), attempt=delivery.attempts)
+
+        attempt = delivery.attempts
+        backoff = 0.0
+        sent = time.time()
+        started = time.perf_counter()
+        try:
+            await self.bot.send_message(
+                text=delivery.text,
+                chat_id=self.chat_id,
+                message_thread_id=self.thread_id,
+                disable_web_page_preview=True,
+            )
+
+        except RetryAfter as e:
+            logging.error(e)
+            outcome, done = f"retry_after {e.timeout}", False
+            delivery.attempts += 1
+            metrics.RETRY_AFTER.inc(chat=self.chat_id)
+            metrics.RETRY_AFTER_SECONDS.inc(e.timeout, chat=self.chat_id)
+            self.limiter.retry_after(self.chat_id, e.timeout)
+
+        except (BadRequest, Unauthorized, NotFound, MigrateToChat) as e:
+            logging.error("Dropping a message rejected by Telegram: %s", e)
+            outcome, done = "dropped", True
+
+        except (TelegramAPIError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Network errors, 5xx responses and restarts of the Bot API server.
+            logging.error(e)
+            outcome, done = f"network_error {type(e).__name__}", False
+            delivery.attempts += 1
+            backoff = min(self.MAX_DELAY, self.BASE_DELAY * 2 ** (delivery.attempts - 1))
+
+        except Exception as e:
+            logging.exception("Failed to send a message to chat %s", self.chat_id)
+            outcome, done = f"error {type(e).__name__}", False
+            delivery.attempts += 1
+            backoff = min(self.MAX_DELAY, self.BASE_DELAY * 2 ** (delivery.attempts - 1))
+
+        else:
+            outcome, done = "delivered", True
+            self.limiter.success(self.chat_id)
+
+        metrics.SEND_SECONDS.observe(time.perf_counter() - started, chat=self.chat_id)
+        if tracer.enabled:
+            self._trace_send(delivery, attempt, sent, outcome)
+
+        if backoff:
+            waited = time.time()
+            await asyncio.sleep(backoff)
+            if tracer.enabled:
+                self._trace(delivery, "backoff", waited, time.time(), attempt=attempt)
+
+        return done
+
+    def _trace_send(self, delivery: Delivery, attempt: int, start: float, outcome: str) -> None:
+        end = time.time()
+        if outcome != "delivered":
+            self._trace(delivery, "send", start, end, attempt=attempt, outcome=outcome)
+            return
+
+        # The delay of every message from its in-game date to its delivery.
+        now = local_timestamp()
+        for message in delivery.messages:
+            tracer.record(
+                message.trace_id, "send", start, end,
+                chat_id=self.chat_id, thread_id=self.thread_id or 0, attempt=attempt,
+                outcome=outcome, date=message.date, delay_seconds=now - message.timestamp,
+            )
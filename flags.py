@@ -0,0 +1,83 @@
+from functools import lru_cache
+
+
+class CountryNotFoundError(Exception):
+    ...
+
+
+CODES = frozenset("""
+    AD AE AF AG AI AL AM AO AQ AR AS AT AU AW AX AZ BA BB BD BE BF BG BH BI BJ BL BM
+    BN BO BQ BR BS BT BV BW BY BZ CA CC CD CF CG CH CI CK CL CM CN CO CR CU CV CW CX
+    CY CZ DE DJ DK DM DO DZ EC EE EG EH ER ES ET EU FI FJ FK FM FO FR GA GB GD GE GF
+    GG GH GI GL GM GN GP GQ GR GS GT GU GW GY HK HM HN HR HT HU ID IE IL IM IN IO IQ
+    IR IS IT JE JM JO JP KE KG KH KI KM KN KP KR KW KY KZ LA LB LC LI LK LR LS LT LU
+    LV LY MA MC MD ME MF MG MH MK ML MM MN MO MP MQ MR MS MT MU MV MW MX MY MZ NA NC
+    NE NF NG NI NL NO NP NR NU NZ OM PA PE PF PG PH PK PL PM PN PR PS PT PW PY QA RE
+    RO RS RU RW SA SB SC SD SE SG SH SI SJ SK SL SM SN SO SR SS ST SV SX SY SZ TC TD
+    TF TG TH TJ TK TL TM TN TO TR TT TV TW TZ UA UG UM US UY UZ VA VC VE VG VI VN VU
+    WF WS YE YT ZA ZM ZW
+""".split())
+
+REGIONAL_INDICATOR_A = 0x1F1E6
+
+
+class Flag:
+    """
+    A country flag.
+
+    The emoji is a pair of regional indicator symbols, one per letter of the
+    ISO 3166 code, so it is computed instead of being looked up in the country table.
+    """
+    __slots__ = ("code", "emoji")
+
+    def __init__(self, code: str) -> None:
+        self.code = code
+        self.emoji = "".join(chr(REGIONAL_INDICATOR_A + ord(letter) - ord("A")) for letter in code)
+
+    @property
+    def unicode(self) -> str:
+        return " ".join(f"U+{ord(symbol):X}" for symbol in self.emoji)
+
+    def __repr__(self) -> str:
+        return f"Flag(code={self.code!r}, emoji={self.emoji!r})"
+
+
+@lru_cache(maxsize=None)
+def get_flag(code: str) -> Flag:
+    """
+    Get a country flag from the given code.
+
+    :param code: country code in ISO 3166 format
+    :return: :class:`Flag`
+    """
+    if code not in CODES:
+        raise CountryNotFoundError(
+            f"Country code {code} not found."
+        )
+
+    return Flag(code)
+
+
+@lru_cache(maxsize=None)
+def get_emoji(code: str) -> str:
+    """
+    Get a country emoji from the given code.
+
+    :param code: country code in ISO 3166 format
+    :return: flag emoji
+    """
+    return get_flag(code).emoji
+
+
+def get_country(code: str):
+    """
+    Get the full country data from the given code.
+
+    The country table is imported on the first call only.
+
+    :param code: country code in ISO 3166 format
+    :return: :class:`countries.CountryData`
+    """
+    from countries import Country
+
+    return Country.get(code)
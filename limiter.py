@@ -0,0 +1,163 @@
+import asyncio
+import time
+
+from typing import Awaitable, Callable, Hashable
+
+
+class TokenBucket:
+    """
+    A token bucket refilled at a constant rate.
+
+    After a flood error the bucket is blocked for the requested time and its
+    rate is halved; each successful send brings the rate back towards the
+    configured one.
+
+    Attributes:
+        MIN_RATE_FACTOR (float): The lowest fraction of the configured rate the bucket can slow down to.
+        RECOVERY_FACTOR (float): The rate multiplier applied after a successful send.
+    """
+    MIN_RATE_FACTOR = 0.125
+    RECOVERY_FACTOR = 1.1
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        Args:
+            rate: The number of tokens added per second.
+            capacity: The maximum number of tokens, i.e. the allowed burst.
+            clock: A monotonic clock returning seconds.
+        """
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.blocked_until = 0.0
+
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self) -> float:
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return now
+
+    def delay(self) -> float:
+        """
+        Get the number of seconds until a token is available.
+
+        Returns:
+            float: Zero if a token can be taken right away.
+        """
+        now = self._refill()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        """
+        Take a token. Call only when :meth:`delay` returned zero.
+        """
+        self.tokens -= 1
+
+    def block(self, seconds: float) -> None:
+        """
+        Stop handing out tokens for the given time and slow the bucket down.
+
+        Args:
+            seconds: The time to wait, as requested by Telegram.
+        """
+        now = self._refill()
+        self.tokens = 0.0
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.rate = max(self.base_rate * self.MIN_RATE_FACTOR, self.rate / 2)
+
+    def recover(self) -> None:
+        """
+        Bring the rate back towards the configured one after a successful send.
+        """
+        self._refill()
+        self.rate = min(self.base_rate, self.rate * self.RECOVERY_FACTOR)
+
+
+class RateLimiter:
+    """
+    An async rate limiter for Telegram sends with a global bucket and one bucket per chat.
+
+    Messages go out as soon as both the global and the chat bucket allow it.
+    """
+
+    def __init__(
+            self,
+            rate: float,
+            chat_rate: float,
+            chat_burst: float,
+            clock: Callable[[], float] = time.monotonic,
+            sleep: Callable[[float], Awaitable] = asyncio.sleep,
+    ) -> None:
+        """
+        Args:
+            rate: The global number of messages per second.
+            chat_rate: The number of messages per second to a single chat.
+            chat_burst: The number of messages a chat can receive back to back.
+            clock: A monotonic clock returning seconds.
+            sleep: The coroutine function used to wait.
+        """
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.bucket = TokenBucket(rate, max(rate, 1), clock)
+        self.chats: dict[Hashable, TokenBucket] = {}
+
+        self._clock = clock
+        self._sleep = sleep
+
+    def chat(self, key: Hashable) -> TokenBucket:
+        """
+        Get the bucket of a chat.
+
+        Args:
+            key: The chat key, e.g. the chat id.
+
+        Returns:
+            TokenBucket: The chat bucket.
+        """
+        if key not in self.chats:
+            self.chats[key] = TokenBucket(self.chat_rate, self.chat_burst, self._clock)
+        return self.chats[key]
+
+    async def acquire(self, key: Hashable) -> None:
+        """
+        Wait until a message can be sent to the chat.
+
+        Args:
+            key: The chat key.
+        """
+        chat = self.chat(key)
+
+        while True:
+            delay = max(self.bucket.delay(), chat.delay())
+            if delay <= 0:
+                self.bucket.take()
+                chat.take()
+                return
+            await self._sleep(delay)
+
+    def retry_after(self, key: Hashable, seconds: float) -> None:
+        """
+        Back off after Telegram answered with RetryAfter.
+
+        Args:
+            key: The chat key.
+            seconds: The ``RetryAfter.timeout`` value.
+        """
+        self.chat(key).block(seconds)
+
+    def success(self, key: Hashable) -> None:
+        """
+        Record a successful send.
+
+        Args:
+            key: The chat key.
+        """
+        self.chat(key).recover()
@@ -1,165 +1,496 @@
-import json
+import time
+import sqlite3
 import asyncio
 import logging
 
-from datetime import datetime
 from dataclasses import dataclass
+from functools import partial
 from asyncio import get_running_loop
 
-from aiogram.utils import markdown
 from aiogram import Bot, Dispatcher
-from aiogram.utils.exceptions import RetryAfter
 
-from config import Config, load_config
-from parser import ChatMessage, parse_chat
+import metrics
+from config import Config, Source, Target, load_config
+from breaker import CircuitBreaker
+from limiter import RateLimiter
+from delivery import DeliveryQueue, prepare_deliveries
+from scheduler import AdaptiveInterval
+from backends import ExecutorBackend, create_executor, get_backend
+from parser import ChatMessage, ChatPage, Cursor, ParserError, catch_up, parse_chat
+from session import SessionDefaults, create_session
+from storage import StateStore, create_store
+from monitoring import start_monitoring
+from tracing import create_exporter, tracer
 
 
 @dataclass
-class MessageLastDate:
+class Outlet:
     """
-    A class that records the last date of a message and saves it in a JSON file.
+    A chat a feed is mirrored to, with its own cursor and delivery queue.
 
     Attributes:
-        FILE_NAME (str): The name of the JSON file to save the last message date.
-        DATE_FORMAT (str): The format of the date in the message.
+        target (Target): The chat.
+        name (str): The name of the cursor in the state store.
+        cursor (Cursor): The cursor of the messages delivered to the chat.
+        queued (Cursor): The cursor of the messages queued for the chat, ahead of ``cursor``.
+        deliveries (DeliveryQueue): The queue of messages to send to the chat.
     """
-    FILE_NAME = "data.json"
-    DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+    target: Target
+    name: str
+    cursor: Cursor
+    queued: Cursor
+    deliveries: DeliveryQueue
 
-    @classmethod
-    def _load(cls) -> dict:
-        """
-        Load the last message date from the JSON file.
 
-        Returns:
-            dict: A dictionary containing the last message date.
-        """
-        with open(cls.FILE_NAME, "r") as f:
-            return json.loads(f.read())
+@dataclass
+class Feed:
+    """
+    A monitored source with its poll cursor and the chats it is mirrored to.
+
+    Attributes:
+        source (Source): The monitored source.
+        polled (Cursor): The cursor of the messages queued for every chat,
+            the least advanced queued cursor of the outlets.
+        outlets (list[Outlet]): The chats to send the messages to.
+        breaker (CircuitBreaker): The circuit breaker of the stats host.
+        reread (bool): Whether a full queue or a failed catch-up left messages behind,
+            so the next poll reads the first page even if it has not changed.
+    """
+    source: Source
+    polled: Cursor
+    outlets: list[Outlet]
+    breaker: CircuitBreaker
+    reread: bool = False
+
 
-    @classmethod
-    def _save(cls, last_date) -> None:
-        """
-        Save the last message date to the JSON file.
+def least_queued(outlets: list[Outlet]) -> Cursor:
+    """
+    Get a copy of the least advanced queued cursor of the outlets.
+
+    Outlets queue the same messages in the same order, so at the same date
+    the cursor with the fewest keys is behind the others.
+
+    Args:
+        outlets: The outlets of a feed.
 
-        Args:
-            last_date: The last message date to be saved.
-        """
-        with open(cls.FILE_NAME, "w") as f:
-            f.write(json.dumps({"last_date": last_date}))
+    Returns:
+        Cursor: The cursor to poll from.
+    """
+    return min((outlet.queued for outlet in outlets), key=lambda cursor: (cursor.timestamp, len(cursor.seen))).copy()
 
-    @classmethod
-    def get(cls) -> datetime:
-        """
-        Get the last message date.
 
-        Returns:
-            datetime: The last message date.
-        """
-        string = cls._load()["last_date"]
-        return datetime.strptime(string, cls.DATE_FORMAT)
+def save_delivered(name: str, cursor: Cursor, messages: list[ChatMessage]) -> None:
+    """
+    Move a cursor past delivered messages and record it in the state store.
 
-    @classmethod
-    def update(cls, last_date: str) -> None:
-        """
-        Update the last message date.
+    Args:
+        name: The name of the cursor in the state store.
+        cursor: The cursor of the delivered messages.
+        messages: The messages accepted by Telegram.
+    """
+    store: StateStore = get_running_loop().__getattribute__("store")
 
-        Args:
-            last_date: The last message date to be updated.
-        """
-        cls._save(last_date=last_date)
+    for message in messages:
+        cursor.advance(message)
+    store.save(name, cursor)
 
 
-async def send_messages(messages: list[ChatMessage]) -> None:
+def send_messages(feed: Feed, messages: list[ChatMessage]) -> bool:
     """
-    Send new messages to the group chat.
+    Queue new messages for the sender workers of every chat of a feed.
+
+    The messages are rendered once and queued for every chat, skipping those
+    already queued for it. Every chat has its own queue and workers, and a
+    full queue is not waited for: the messages it had no room for are read
+    again on the next poll, from the queued cursor of the chat, so a slow or
+    flood-limited chat does not hold back the others or the polling.
+    In batch mode consecutive messages are packed into a single Telegram message.
 
     Args:
+        feed: The feed the messages belong to.
         messages: A list of new messages to be sent.
+
+    Returns:
+        bool: True if any message was queued, False if every queue was full.
     """
-    loop = get_running_loop()
+    config: Config = get_running_loop().__getattribute__("config")
+
+    rendering = time.time()
+    deliveries = prepare_deliveries(messages, batch=config.BATCH_MESSAGES)
+    if tracer.enabled:
+        rendered = time.time()
+        for message in messages:
+            tracer.record(message.trace_id, "render", rendering, rendered, deliveries=len(deliveries))
+
+    queued_any, feed.reread = False, False
+    for outlet in feed.outlets:
+        cursor = outlet.queued
+        pending = [message for message in messages if not cursor.behind(message) and message.key not in cursor.seen]
+        if not pending:
+            continue
+        if len(pending) < len(messages):
+            pending_deliveries = prepare_deliveries(pending, batch=config.BATCH_MESSAGES)
+        else:
+            pending_deliveries = deliveries
+
+        count = outlet.deliveries.put_nowait(pending_deliveries)
+        for delivery in pending_deliveries[:count]:
+            for message in delivery.messages:
+                cursor.advance(message)
+
+        queued_any = queued_any or count > 0
+        feed.reread = feed.reread or count < len(pending_deliveries)
+
+    return queued_any
+
+
+def trace_poll(
+        source: Source,
+        messages: list[ChatMessage],
+        first: int,
+        page: ChatPage,
+        started: float,
+        parsed: float,
+) -> None:
+    """
+    Record the fetch, parse and filter spans of newly polled messages.
 
-    bot: Bot = loop.__getattribute__("bot")
+    The page is received and parsed at once, so the fetch span covers the
+    time spent waiting for the body and the parse span the rest of the poll
+    of the page. Messages read back from older pages get a backfill span instead.
+
+    Args:
+        source: The polled source.
+        messages: The new messages, those of the first page first.
+        first: The number of new messages of the first page.
+        page: The first page.
+        started: The start of the poll, in seconds since the epoch.
+        parsed: The end of the first page, in seconds since the epoch.
+    """
+    filtered = time.time()
+    fetched = started + page.fetch_time
+
+    for number, message in enumerate(messages):
+        trace_id = message.trace_id
+        if number < first:
+            tracer.record(trace_id, "fetch", started, fetched, source=source.name, page=page.number)
+            tracer.record(trace_id, "parse", fetched, parsed, source=source.name, rows=page.rows)
+            tracer.record(trace_id, "filter", parsed, filtered, source=source.name, new=len(messages))
+        else:
+            tracer.record(trace_id, "backfill", parsed, filtered, source=source.name)
+
+
+async def send_new_message(feed: Feed) -> bool:
+    """
+    Check for new messages and queue them for the group chat if there are any.
+
+    The poll cursor runs ahead of the delivered cursors, so queued messages
+    are not read again while they wait for a sender. After a full queue left
+    messages behind, the page is read even if it has not changed. If every row of the
+    first page is new, older pages are read back to the cursor, so messages
+    posted while the bot was down or backing off are not lost. If an older
+    page fails, nothing is queued and the whole poll is retried.
+
+    While the circuit breaker of the source is open, the source is not polled.
+
+    Args:
+        feed: The feed to check.
+
+    Returns:
+        bool: True if new messages were queued, False otherwise.
+    """
+    loop = get_running_loop()
     config: Config = loop.__getattribute__("config")
+    backend = loop.__getattribute__("backend")
+    source = feed.source
+    page = ChatPage()
 
-    for message in messages:
+    if not feed.breaker.allow():
+        return False
+
+    started = time.time()
+    messages = [
+        message async for message in
+        parse_chat(
+            source.base_url, source.game, backend=backend, cutoff=feed.polled, page=page,
+            conditional=not feed.reread,
+        )
+    ]
+    parsed, first = time.time(), len(messages)
+
+    if page.failed:
+        feed.breaker.failure(page.error)
+        return False
+
+    metrics.FETCH_SECONDS.observe(page.fetch_time, source=source.name)
+    metrics.PARSE_SECONDS.observe(page.parse_time, source=source.name)
+    metrics.ROWS_PARSED.observe(page.rows, source=source.name)
+
+    # Only a page without any delivered row can have pushed older messages off.
+    if page.rows and first == page.rows and feed.polled.date and config.BACKFILL_PAGES > 1:
         try:
-            text = (
-                f"{message.user_country} "
-                f"{markdown.hlink(message.user_name, message.user_link)}\n\n"
-                f"💬 {markdown.hcode(message.text)}\n\n"
-                f"{markdown.hspoiler('🗺 ', message.map)}\n"
-                f"{markdown.hspoiler('📅 ', message.date)}"
-            )
-            await bot.send_message(
-                text=text,
-                chat_id=config.GROUP_ID,
-                message_thread_id=config.LIVE_CHAT_ID,
-                disable_web_page_preview=True,
+            older = await catch_up(
+                source.base_url,
+                source.game,
+                backend=backend,
+                cutoff=feed.polled,
+                semaphore=loop.__getattribute__("backfill"),
+                window=config.BACKFILL_CONCURRENCY,
+                max_pages=config.BACKFILL_PAGES,
             )
+        except ParserError as e:
+            # Queue nothing, so the cursor stays before the gap and the next poll reads it again.
+            feed.breaker.failure(f"catch-up {' '.join(map(str, e.args))}")
+            feed.reread = True
+            return False
+        messages = list(dict.fromkeys(messages + older))
 
-        except RetryAfter as e:
-            logging.error(e)
+    feed.breaker.success()
 
-            seconds = int(e.args[0].split()[-2])
-            await asyncio.sleep(seconds)
+    metrics.NEW_MESSAGES.observe(len(messages), source=source.name)
+    if not messages:
+        return False
 
-        await asyncio.sleep(1)
+    if tracer.enabled:
+        trace_poll(source, messages, first, page, started, parsed)
 
+    messages.reverse()
+    queued = send_messages(feed, messages)
+    feed.polled = least_queued(feed.outlets)
+    return queued
 
-async def send_new_message() -> None:
+
+async def schedule_task(feed: Feed) -> None:
     """
-    Check for new messages and send them to the group chat if there are any.
+    Schedule a task to check for new messages and queue them for the group chat.
 
-    Returns:
-        bool: True if new messages were sent, False otherwise.
+    Polls often while the chat is active and backs off while it is idle.
+    A poll that raises counts as a failure of the source, so a broken page
+    does not stop the task.
+
+    Args:
+        feed: The feed to check.
     """
-    base_url = "https://toma92.myarena.site"
-    messages = await parse_chat(base_url)
-    if not messages:
-        return
+    config: Config = get_running_loop().__getattribute__("config")
+    interval = AdaptiveInterval(config.POLL_INTERVAL_MIN, config.POLL_INTERVAL_MAX)
 
-    last_date = MessageLastDate.get()
+    while True:
+        started = time.perf_counter()
+        try:
+            active = await send_new_message(feed)
+        except Exception as e:
+            logging.exception("Failed to poll %s", feed.source.name)
+            feed.breaker.failure(f"{type(e).__name__}: {e}")
+            active = False
+        metrics.POLL_SECONDS.observe(time.perf_counter() - started, source=feed.source.name)
+        await asyncio.sleep(interval.next(active))
 
-    messages = [
-        message for message in messages if
-        datetime.strptime(message.date, MessageLastDate.DATE_FORMAT) > last_date
-    ]
 
-    if messages:
-        last_date = messages[0].date
-        await send_messages(messages[::-1])
-        MessageLastDate.update(last_date)
+async def trace_task(interval: float) -> None:
+    """
+    Periodically export the recorded spans.
+
+    Args:
+        interval: The time between exports, in seconds.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        await tracer.flush()
 
 
-async def schedule_task() -> None:
+async def flush_task(store: StateStore, interval: float) -> None:
     """
-    Schedule a task to check for new messages and send them to the group chat.
+    Periodically write the changed cursors to the state store.
+
+    Args:
+        store: The state store.
+        interval: The time between writes, in seconds.
     """
     while True:
-        await send_new_message()
-        await asyncio.sleep(3)
+        await asyncio.sleep(interval)
+        try:
+            store.flush()
+        except (OSError, sqlite3.Error) as e:
+            logging.error("Failed to save the cursors: %s", e)
+
+
+def create_outlet(
+        source: Source,
+        target: Target,
+        bot: Bot,
+        limiter: RateLimiter,
+        store: StateStore,
+        config: Config,
+) -> Outlet:
+    """
+    Create the outlet of a chat, starting from its saved cursor.
 
+    A chat without a cursor of its own starts from the cursor saved for the
+    whole source before messages were fanned out to several chats.
 
-async def main():
-    logging.basicConfig(level=logging.INFO)
-    config: Config = load_config()
+    Args:
+        source: The monitored source.
+        target: The chat.
+        bot: The bot sending the messages.
+        limiter: The rate limiter shared by all feeds.
+        store: The state store holding the cursors.
+        config: The bot config.
+
+    Returns:
+        Outlet: The outlet.
+    """
+    name = f"{source.name}#{target.name}"
+    cursor = store.load(name if store.has(name) else source.name)
+
+    deliveries = DeliveryQueue(
+        bot=bot,
+        limiter=limiter,
+        chat_id=target.chat_id,
+        thread_id=target.thread_id,
+        on_delivered=partial(save_delivered, name, cursor),
+        maxsize=config.QUEUE_SIZE,
+    )
+    return Outlet(target=target, name=name, cursor=cursor, queued=cursor.copy(), deliveries=deliveries)
 
+
+def create_feed(source: Source, bot: Bot, limiter: RateLimiter, store: StateStore, config: Config) -> Feed:
+    """
+    Create the feed of a source, polling from the least advanced cursor of its chats.
+
+    Args:
+        source: The monitored source.
+        bot: The bot sending the messages.
+        limiter: The rate limiter shared by all feeds.
+        store: The state store holding the cursors.
+        config: The bot config.
+
+    Returns:
+        Feed: The feed.
+    """
+    outlets = [create_outlet(source, target, bot, limiter, store, config) for target in source.targets]
+    polled = least_queued(outlets)
+
+    breaker = CircuitBreaker(
+        source.name,
+        threshold=config.BREAKER_THRESHOLD,
+        max_delay=config.BREAKER_MAX_DELAY,
+    )
+    return Feed(source=source, polled=polled, outlets=outlets, breaker=breaker)
+
+
+def install_event_loop(name: str) -> None:
+    """
+    Select the event loop implementation before the loop is created.
+
+    Args:
+        name: ``asyncio`` for the default loop, or ``uvloop``, which falls back
+              to the default loop when uvloop is not installed.
+    """
+    match name:
+        case "asyncio":
+            pass
+        case "uvloop":
+            try:
+                import uvloop
+            except ImportError:
+                logging.warning("uvloop is not installed, using the default event loop")
+                return
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        case _:
+            raise ValueError(f"Event loop {name} is not supported.")
+
+
+async def main(config: Config):
     bot = Bot(config.TOKEN, parse_mode="HTML")
-    dp = Dispatcher(bot)
+
+    SessionDefaults.MAX_BODY_SIZE = config.MAX_PAGE_SIZE
+    SessionDefaults.ENCODING = config.PAGE_ENCODING
+    SessionDefaults.CONNECT_TIMEOUT = config.FETCH_CONNECT_TIMEOUT
+    SessionDefaults.READ_TIMEOUT = config.FETCH_READ_TIMEOUT
+    SessionDefaults.TOTAL_TIMEOUT = config.FETCH_TOTAL_TIMEOUT
+    session = create_session()
+
+    backend = get_backend(config.PARSER_BACKEND)
+    executor = None
+    if config.PARSER_EXECUTOR != "none":
+        executor = create_executor(config.PARSER_EXECUTOR, config.PARSER_WORKERS)
+        backend = ExecutorBackend(backend, executor)
 
     loop = asyncio.get_event_loop()
 
     loop.__setattr__("bot", bot)
     loop.__setattr__("config", config)
-
-    tasks = [
-        asyncio.create_task(schedule_task()),
-        asyncio.create_task(dp.start_polling())
-    ]
-
-    await asyncio.gather(*tasks)
+    loop.__setattr__("session", session)
+    loop.__setattr__("backend", backend)
+    loop.__setattr__("backfill", asyncio.Semaphore(config.BACKFILL_CONCURRENCY))
+
+    tracer.exporter = create_exporter(config.TRACE_EXPORTER, config.TRACE_FILE, config.TRACE_ENDPOINT, session)
+
+    store = create_store(config.STATE_BACKEND, config.STATE_FILE)
+    loop.__setattr__("store", store)
+
+    limiter = RateLimiter(
+        rate=config.GLOBAL_RATE_LIMIT,
+        chat_rate=config.CHAT_RATE_LIMIT / 60,
+        chat_burst=config.CHAT_BURST,
+    )
+    feeds = [create_feed(source, bot, limiter, store, config) for source in config.SOURCES]
+    loop.__setattr__("feeds", feeds)
+
+    monitoring = None
+    if config.MONITORING_PORT:
+        monitoring = await start_monitoring(config.MONITORING_HOST, config.MONITORING_PORT)
+
+    tasks = [asyncio.create_task(flush_task(store, config.STATE_FLUSH_INTERVAL))]
+    if tracer.enabled:
+        tasks.append(asyncio.create_task(trace_task(config.TRACE_EXPORT_INTERVAL)))
+
+    webhook = None
+    match config.UPDATES_MODE:
+        case "polling":
+            tasks.append(asyncio.create_task(Dispatcher(bot).start_polling()))
+        case "webhook":
+            if not config.WEBHOOK_URL:
+                raise ValueError("WEBHOOK_URL is required in the webhook updates mode.")
+
+            from webhook import start_webhook  # only this mode pays for the aiogram webhook module
+
+            webhook = await start_webhook(
+                Dispatcher(bot),
+                url=config.WEBHOOK_URL,
+                host=config.WEBHOOK_HOST,
+                port=config.WEBHOOK_PORT,
+                path=config.WEBHOOK_PATH,
+                secret=config.WEBHOOK_SECRET,
+            )
+        case "none":
+            pass
+        case _:
+            raise ValueError(f"Updates mode {config.UPDATES_MODE} is not supported.")
+
+    for feed in feeds:
+        tasks.append(asyncio.create_task(schedule_task(feed)))
+        for outlet in feed.outlets:
+            tasks.extend(asyncio.create_task(outlet.deliveries.worker()) for _ in range(config.SENDER_WORKERS))
+
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        if webhook:
+            await webhook.cleanup()
+        if monitoring:
+            await monitoring.cleanup()
+        store.close()
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+        await tracer.flush()
+        await session.close()
+        await (await bot.get_session()).close()
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    logging.basicConfig(level=logging.INFO)
+    config: Config = load_config()
+
+    install_event_loop(config.EVENT_LOOP)
+    asyncio.run(main(config))
@@ -0,0 +1,181 @@
+import bisect
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+
+    def escape(value: str) -> str:
+        return value.replace("\\", r"\\").replace('"', r'\"').replace("\n", r"\n")
+
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _key(labels: dict) -> tuple[tuple[str, str], ...]:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class Metric:
+    """
+    Base class of the metrics.
+
+    Attributes:
+        TYPE (str): The Prometheus metric type.
+    """
+    TYPE = "untyped"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        """
+        Args:
+            name: The metric name.
+            documentation: The help text.
+        """
+        self.name = name
+        self.documentation = documentation
+
+    def samples(self) -> list[tuple[str, tuple[tuple[str, str], ...], float]]:
+        """
+        Get the current samples of the metric.
+
+        Returns:
+            list: The sample name, labels and value of every sample.
+        """
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """
+        Render the metric in the text exposition format.
+
+        Returns:
+            str: The metric text.
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class Counter(Metric):
+    """
+    A value that only goes up.
+    """
+    TYPE = "counter"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        super().__init__(name, documentation)
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> list[tuple[str, tuple[tuple[str, str], ...], float]]:
+        return [(self.name, key, value) for key, value in self.values.items()]
+
+
+class Gauge(Metric):
+    """
+    A value that is set to the current state.
+    """
+    TYPE = "gauge"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        super().__init__(name, documentation)
+        self.values: dict[tuple, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        self.values[_key(labels)] = value
+
+    def samples(self) -> list[tuple[str, tuple[tuple[str, str], ...], float]]:
+        return [(self.name, key, value) for key, value in self.values.items()]
+
+
+class Histogram(Metric):
+    """
+    Observations counted in cumulative buckets, with their sum and count.
+    """
+    TYPE = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """
+        Args:
+            name: The metric name.
+            documentation: The help text.
+            buckets: The sorted upper bounds of the buckets, without +Inf.
+        """
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+        self.values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _key(labels)
+        if key not in self.values:
+            # Bucket counts, with the +Inf bucket last, then the sum.
+            self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+
+        counts = self.values[key]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self) -> list[tuple[str, tuple[tuple[str, str], ...], float]]:
+        samples = []
+        for key, counts in self.values.items():
+            total = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                total += count
+                samples.append((f"{self.name}_bucket", key + (("le", _format_value(float(bound))),), total))
+            samples.append((f"{self.name}_sum", key, counts[-1]))
+            samples.append((f"{self.name}_count", key, total))
+        return samples
+
+
+FETCH_SECONDS = Histogram("hlstats_fetch_seconds", "Time spent waiting for the first chat page.")
+PARSE_SECONDS = Histogram("hlstats_parse_seconds", "Time spent parsing the first chat page.")
+POLL_SECONDS = Histogram("hlstats_poll_seconds", "Time taken by a whole poll, including backfill and queueing.")
+ROWS_PARSED = Histogram("hlstats_rows_parsed", "Rows read from the first chat page per poll.", COUNT_BUCKETS)
+NEW_MESSAGES = Histogram("hlstats_new_messages", "New messages queued per poll.", COUNT_BUCKETS)
+SEND_SECONDS = Histogram("telegram_send_seconds", "Latency of the sendMessage calls.")
+RETRY_AFTER = Counter("telegram_retry_after_total", "Number of RetryAfter responses.")
+RETRY_AFTER_SECONDS = Counter("telegram_retry_after_seconds_total", "Seconds requested by RetryAfter responses.")
+DELIVERIES_QUEUED = Counter("delivery_queued_total", "Deliveries put into the delivery queue.")
+DELIVERIES_DONE = Counter("delivery_done_total", "Deliveries sent or dropped.")
+SEND_RETRIES = Counter("delivery_retries_total", "Failed send attempts that are retried.")
+QUEUE_FULL = Counter("delivery_queue_full_total", "Deliveries left for a later poll by a full queue.")
+QUEUE_DEPTH = Gauge("delivery_queue_depth", "Deliveries waiting in the queue.")
+CURSOR_LAG = Gauge("cursor_lag_seconds", "Seconds between now and the date of the last delivered message.")
+
+METRICS: list[Metric] = [
+    FETCH_SECONDS,
+    PARSE_SECONDS,
+    POLL_SECONDS,
+    ROWS_PARSED,
+    NEW_MESSAGES,
+    SEND_SECONDS,
+    RETRY_AFTER,
+    RETRY_AFTER_SECONDS,
+    DELIVERIES_QUEUED,
+    DELIVERIES_DONE,
+    SEND_RETRIES,
+    QUEUE_FULL,
+    QUEUE_DEPTH,
+    CURSOR_LAG,
+]
+
+
+def render_metrics() -> str:
+    """
+    Render all metrics in the text exposition format.
+
+    Returns:
+        str: The metrics text.
+    """
+    return "".join(metric.render() for metric in METRICS)
@@ -0,0 +1,86 @@
+from asyncio import get_running_loop
+
+from aiohttp import web
+
+import metrics
+from parser import local_timestamp
+
+
+async def health(request: web.Request) -> web.Response:
+    """
+    Report the state of every monitored source.
+
+    Responds with 503 while the circuit breaker of any source is not closed.
+
+    Args:
+        request: The HTTP request.
+
+    Returns:
+        web.Response: The JSON health report.
+    """
+    feeds = get_running_loop().__getattribute__("feeds")
+
+    sources = {feed.source.name: feed.breaker.health() for feed in feeds}
+    healthy = all(state["state"] == "closed" for state in sources.values())
+
+    return web.json_response(
+        {"status": "ok" if healthy else "degraded", "sources": sources},
+        status=200 if healthy else 503,
+    )
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    """
+    Report the metrics in the Prometheus text format.
+
+    The queue depth and the cursor lag of every chat are read at scrape time.
+    The lag compares the local clock with the dates of the stats host, so it
+    includes any difference between their time zones.
+
+    Args:
+        request: The HTTP request.
+
+    Returns:
+        web.Response: The metrics text.
+    """
+    feeds = get_running_loop().__getattribute__("feeds")
+    now = local_timestamp()
+
+    for feed in feeds:
+        for outlet in feed.outlets:
+            labels = {"source": feed.source.name, "target": outlet.target.name}
+            metrics.QUEUE_DEPTH.set(outlet.deliveries.depth, **labels)
+            if outlet.cursor.timestamp:
+                metrics.CURSOR_LAG.set(now - outlet.cursor.timestamp, **labels)
+
+    return web.Response(text=metrics.render_metrics(), content_type="text/plain", charset="utf-8")
+
+
+def create_app() -> web.Application:
+    """
+    Create the monitoring HTTP application.
+
+    Returns:
+        web.Application: The application serving ``/health`` and ``/metrics``.
+    """
+    app = web.Application()
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics_handler)
+    return app
+
+
+async def start_monitoring(host: str, port: int) -> web.AppRunner:
+    """
+    Start serving the monitoring application.
+
+    Args:
+        host: The address to listen on.
+        port: The port to listen on.
+
+    Returns:
+        web.AppRunner: The runner, to be cleaned up on shutdown.
+    """
+    runner = web.AppRunner(create_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -1,65 +1,615 @@
-from dataclasses import dataclass
+import time
+import codecs
+import asyncio
+import hashlib
+import logging
+
+from collections import OrderedDict
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from datetime import datetime
+from asyncio import get_running_loop
+from typing import AsyncIterator, ClassVar, Iterable
 
 import aiohttp
 
-from bs4 import BeautifulSoup
-from countries import Country, CountryNotFoundError
+from aiogram.utils import markdown
+
+from backends import ChatRow, ParserBackend, get_backend
+from flags import CountryNotFoundError, get_emoji
+from session import SessionDefaults
 
 
 class ParserError(Exception):
     ...
 
 
-@dataclass
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+
+def parse_timestamp(date: str) -> int:
+    """
+    Convert an HLstats ``%Y-%m-%d %H:%M:%S`` date to seconds since the epoch.
+
+    The date is read as UTC; it is only used to order and compare messages.
+    ``datetime.fromisoformat`` is implemented in C and is much faster than ``strptime``.
+
+    Args:
+        date: The date string.
+
+    Returns:
+        int: The timestamp, or 0 for an empty date.
+    """
+    if not date:
+        return 0
+
+    moment = datetime.fromisoformat(date)
+    return (
+        (moment.toordinal() - EPOCH_ORDINAL) * 86400
+        + moment.hour * 3600 + moment.minute * 60 + moment.second
+    )
+
+
+def local_timestamp() -> int:
+    """
+    Get the current local time on the scale of :func:`parse_timestamp`.
+
+    Differences with the timestamps of the stats host include any difference
+    between the time zones of the two machines.
+
+    Returns:
+        int: The timestamp.
+    """
+    return parse_timestamp(datetime.now().isoformat(" ", "seconds"))
+
+
+@dataclass(frozen=True, slots=True, eq=False)
 class ChatMessage:
+    """
+    A chat message read from the HLstats chat page.
+
+    Messages are immutable and compare and hash by their key, i.e. by
+    their date, author and text. The Telegram HTML is rendered on first use
+    and cached, so retries and batches reuse it.
+    """
     map: str
     date: str
     text: str
     user_name: str
     user_link: str
     user_country: str
+    timestamp: int = 0
+    key: int = field(init=False, repr=False)
+    _html: None | str = field(default=None, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        data = "\0".join((self.date, self.user_link, self.text)).encode()
+        object.__setattr__(self, "key", int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big"))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ChatMessage):
+            return NotImplemented
+        return self.key == other.key
+
+    def __hash__(self) -> int:
+        return self.key
+
+    @property
+    def trace_id(self) -> str:
+        """
+        The id of the trace following the message to Telegram, derived from its key,
+        so the message keeps its trace when it is read again.
+        """
+        return f"{self.key:032x}"
+
+    @property
+    def rendered_html(self) -> str:
+        """
+        The message rendered as Telegram HTML.
+        """
+        if self._html is None:
+            object.__setattr__(self, "_html", (
+                f"{self.user_country} "
+                f"{markdown.hlink(self.user_name, self.user_link)}\n\n"
+                f"💬 {markdown.hcode(self.text)}\n\n"
+                f"{markdown.hspoiler('🗺 ', self.map)}\n"
+                f"{markdown.hspoiler('📅 ', self.date)}"
+            ))
+        return self._html
+
+
+class SeenSet:
+    """
+    Bounded index of the keys of recently delivered messages, oldest first.
+
+    Attributes:
+        MAX_SIZE (int): The maximum number of keys kept; the oldest keys are evicted first.
+    """
+    MAX_SIZE = 2048
+    __slots__ = ("_keys",)
+
+    def __init__(self, items: Iterable[tuple[int, int]] = ()) -> None:
+        self._keys: OrderedDict[int, int] = OrderedDict(items)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: int, timestamp: int) -> None:
+        """
+        Add the key of a delivered message.
+
+        Args:
+            key: The message key.
+            timestamp: The message timestamp.
+        """
+        self._keys[key] = timestamp
+        self._keys.move_to_end(key)
+        while len(self._keys) > self.MAX_SIZE:
+            self._keys.popitem(last=False)
+
+    def evict(self, horizon: int) -> None:
+        """
+        Drop the oldest keys of messages sent before the horizon.
+
+        Args:
+            horizon: The timestamp of the oldest message to keep.
+        """
+        while self._keys and next(iter(self._keys.values())) < horizon:
+            self._keys.popitem(last=False)
+
+    def items(self) -> list[tuple[int, int]]:
+        return list(self._keys.items())
+
+
+@dataclass
+class Cursor:
+    """
+    Position of the newest delivered message and the recently delivered messages.
+
+    Messages are identified by their key, so messages sent in the same second,
+    or showing up late with an older date, are neither lost nor sent twice.
+    Messages older than ``WINDOW`` before the cursor date are considered delivered.
+
+    All comparisons use the integer timestamps computed once per message.
+
+    Attributes:
+        date (str): The date of the newest delivered message.
+        seen (SeenSet): The keys of the messages delivered within the window.
+        timestamp (int): The timestamp of the newest delivered message.
+        horizon (int): The timestamp before which every message is considered delivered.
+            Without keys, it is just past the cursor date.
+        WINDOW (int): How many seconds before the cursor date delivered keys are remembered.
+    """
+    WINDOW: ClassVar[int] = 60
+
+    date: str = ""
+    seen: SeenSet = field(default_factory=SeenSet)
+    timestamp: int = field(default=0, init=False)
+    horizon: int = field(default=0, init=False)
+
+    def __post_init__(self) -> None:
+        self.timestamp = parse_timestamp(self.date)
+        if not self.date:
+            self.horizon = 0
+        elif self.seen:
+            self.horizon = self.timestamp - self.WINDOW
+        else:
+            # Nothing is known about the delivered messages but their last date.
+            self.horizon = self.timestamp + 1
+
+    def behind(self, message: ChatMessage) -> bool:
+        """
+        Check whether a message is older than any message that may still be new.
+
+        Args:
+            message: The chat message.
+
+        Returns:
+            bool: True if this and all older messages were delivered.
+        """
+        return message.timestamp < self.horizon
+
+    def copy(self) -> "Cursor":
+        cursor = Cursor(date=self.date, seen=SeenSet(self.seen.items()))
+        cursor.horizon = self.horizon
+        return cursor
+
+    def dump(self) -> dict:
+        """
+        Convert the cursor to JSON-serializable data.
+
+        Returns:
+            dict: The cursor data.
+        """
+        return {"last_date": self.date, "horizon": self.horizon, "seen": self.seen.items()}
+
+    @classmethod
+    def load(cls, data: dict) -> "Cursor":
+        """
+        Create a cursor from the data returned by :meth:`dump`.
+
+        A state file of earlier versions only holds ``last_date``; every message
+        up to that date is then considered delivered.
+
+        Args:
+            data: The cursor data.
+
+        Returns:
+            Cursor: The cursor.
+        """
+        date = data.get("last_date", "")
+        seen = SeenSet((key, timestamp) for key, timestamp in data.get("seen", []))
+
+        cursor = cls(date=date, seen=seen)
+        if "horizon" in data:
+            cursor.horizon = data["horizon"]
+        return cursor
+
+    def advance(self, message: ChatMessage) -> None:
+        """
+        Move the cursor past a delivered message.
+
+        Args:
+            message: The delivered chat message.
+        """
+        self.seen.add(message.key, message.timestamp)
+        if message.timestamp > self.timestamp:
+            self.date = message.date
+            self.timestamp = message.timestamp
+            self.horizon = max(self.horizon, message.timestamp - self.WINDOW)
+            self.seen.evict(self.horizon)
+
+
+@dataclass
+class ChatPage:
+    """
+    Outcome of reading a chat page.
+
+    Attributes:
+        number (int): The page number, 1 being the newest messages.
+        rows (int): The number of rows read.
+        changed (bool): False if the page was skipped as unchanged.
+        reached (bool): True if reading stopped at the cutoff.
+        error (str): Why the page could not be fetched, if it could not.
+        fetch_time (float): Seconds spent waiting for the page body.
+        parse_time (float): Seconds spent parsing the received body.
+    """
+    number: int = 1
+    rows: int = 0
+    changed: bool = True
+    reached: bool = False
+    error: None | str = None
+    fetch_time: float = 0.0
+    parse_time: float = 0.0
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+
+
+@dataclass
+class PageValidators:
+    """
+    Validators of the last fetched version of a page.
+
+    Attributes:
+        etag (str): The ETag header sent by the server, if any.
+        last_modified (str): The Last-Modified header sent by the server, if any.
+        digest (bytes): A hash of the top of the chat table, used when the server
+            ignores the conditional headers.
+        HASH_SIZE (int): The number of bytes of the chat table hashed. New messages
+            are added at the top, so they always change this part.
+    """
+    HASH_SIZE: ClassVar[int] = 16384
+
+    etag: None | str = None
+    last_modified: None | str = None
+    digest: None | bytes = None
+
+    def headers(self) -> dict[str, str]:
+        """
+        Build the conditional request headers.
+
+        Returns:
+            dict: The If-None-Match / If-Modified-Since headers.
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def update(self, headers, body: bytes, final: bool) -> None | bool:
+        """
+        Remember the validators of a fresh response.
+
+        Only the top of the chat table is hashed, so a page footer with a
+        generation time does not make every response look new, and the
+        decision can be taken before the rest of the page is received.
+
+        Args:
+            headers: The response headers.
+            body: The start of the raw response body.
+            final: Whether ``body`` is the whole response body.
+
+        Returns:
+            bool | None: True if the page has changed since the previous response,
+                None if more of the body is needed to tell.
+        """
+        start = body.find(b"data-table")
+        if start == -1:
+            if not final:
+                return None
+        else:
+            end = body.find(b"</table>", start)
+            if end == -1 and len(body) - start < self.HASH_SIZE and not final:
+                return None
+            body = body[start:min(end if end != -1 else len(body), start + self.HASH_SIZE)]
+
+        self.etag = headers.get("ETag")
+        self.last_modified = headers.get("Last-Modified")
+
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        changed, self.digest = digest != self.digest, digest
+        return changed
+
+
+_validators: dict[str, PageValidators] = {}
+
+
+async def stream_html_page(url, page: None | ChatPage = None, conditional: bool = True) -> AsyncIterator[str]:
+    """
+    Fetch a page and yield its text in chunks as they are received.
 
+    The time spent waiting for the chunks is added to the fetch time of the page.
+    Network errors and timeouts are raised as :class:`ParserError`.
 
-async def fetch_html_page(url) -> str:
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
+    The body is decoded incrementally with the charset of the response, or
+    ``SessionDefaults.ENCODING``, without charset detection. Bodies larger than
+    ``SessionDefaults.MAX_BODY_SIZE`` are cut; the newest messages come first,
+    so the rows received before the cut are still read.
+
+    Args:
+        url: The URL of the page.
+        page: The page to record an unchanged response and the fetch time in.
+        conditional: Whether to skip an unchanged page, which then yields nothing.
+
+    Yields:
+        str: The decoded text.
+    """
+    page = page or ChatPage()
+
+    async with aclosing(_read_html_page(url, page, conditional)) as chunks:
+        while True:
+            started = time.perf_counter()
+            try:
+                chunk = await anext(chunks)
+            except StopAsyncIteration:
+                return
+            finally:
+                page.fetch_time += time.perf_counter() - started
+            yield chunk
+
+
+async def _drain(response: aiohttp.ClientResponse, received: int) -> None:
+    # Read the rest of the body, so the connection is kept alive.
+    async for chunk in response.content.iter_chunked(SessionDefaults.CHUNK_SIZE):
+        received += len(chunk)
+        if received > SessionDefaults.MAX_BODY_SIZE:
+            break
+
+
+async def _read_html_page(url, page: ChatPage, conditional: bool) -> AsyncIterator[str]:
+    loop = get_running_loop()
+    session: aiohttp.ClientSession = loop.__getattribute__("session")
+
+    validators = _validators.setdefault(url, PageValidators()) if conditional else None
+    headers = validators.headers() if validators else {}
+
+    try:
+        async with session.get(url, headers=headers) as response:
             match response.status:
                 case 200:
-                    return await response.text()
+                    pass
+                case 304 if validators:
+                    page.changed = False
+                    return
                 case _:
                     raise ParserError(response.status, response.reason)
 
+            decoder = codecs.getincrementaldecoder(response.charset or SessionDefaults.ENCODING)(errors="replace")
+            received = 0
+            pending = b""
+
+            try:
+                async for chunk in response.content.iter_chunked(SessionDefaults.CHUNK_SIZE):
+                    received += len(chunk)
+                    truncated = received > SessionDefaults.MAX_BODY_SIZE
+                    if truncated:
+                        chunk = chunk[:len(chunk) - (received - SessionDefaults.MAX_BODY_SIZE)]
+                        logging.warning("Page %s is larger than %d bytes, reading the start only",
+                                        url, SessionDefaults.MAX_BODY_SIZE)
+
+                    if validators:
+                        pending += chunk
+                        changed = validators.update(response.headers, pending, final=truncated)
+                        if changed is None:
+                            continue
+                        if not changed:
+                            page.changed = False
+                            if not truncated:
+                                await _drain(response, received)
+                            return
+                        validators, chunk, pending = None, pending, b""
+
+                    yield decoder.decode(chunk)
+                    if truncated:
+                        return
 
-async def parse_chat(base_url: str) -> None | list[ChatMessage]:
-    url = base_url + "/stats/hlstats.php?mode=chat&game=l4d"  # noqa
+                if validators and not validators.update(response.headers, pending, final=True):
+                    page.changed = False
+                    return
 
+                yield decoder.decode(pending, final=True)
+
+            except GeneratorExit:
+                await _drain(response, received)
+                raise
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise ParserError(type(e).__name__, str(e)) from e
+
+
+def build_message(row: ChatRow, base_url: str) -> ChatMessage:
+    """
+    Build a chat message from a raw table row.
+
+    Args:
+        row: The parsed table row.
+        base_url: The base URL of the HLstats site.
+
+    Returns:
+        ChatMessage: The chat message.
+    """
     try:
-        data: list[ChatMessage] = []
-        html = await fetch_html_page(url)
-        soup = BeautifulSoup(html, "html.parser")
-        table = soup.find("table", class_="data-table")
+        country_emoji = get_emoji(row.country_code.upper())
+    except CountryNotFoundError:
+        country_emoji = "🏴‍☠️"
 
-        for row in table.find_all("tr")[1:]:
-            try:
-                county_code = row.find("img")["src"].split("/")[-1].split(".")[0]
-                country_emoji = Country.get_emoji(code=county_code.upper())
-            except CountryNotFoundError:
-                country_emoji = "🏴‍☠️"
-
-            data.append(
-                ChatMessage(
-                    map=row.find_all("td")[4].text.strip(),
-                    date=row.find_all("td")[0].text.strip(),
-                    text=row.find_all("td")[2].text.strip(),
-                    user_name=row.find("a").text.strip(),
-                    user_link=base_url + row.find("a")["href"],
-                    user_country=country_emoji,
-                )
-            )
-
-        return data
-
-    except ParserError:
-        ...
-
-    return None
+    return ChatMessage(
+        map=row.map,
+        date=row.date,
+        text=row.text,
+        user_name=row.user_name,
+        user_link=base_url + row.user_href,
+        user_country=country_emoji,
+        timestamp=parse_timestamp(row.date),
+    )
+
+
+async def parse_chat(
+        base_url: str,
+        game: str = "l4d",
+        backend: None | ParserBackend = None,
+        cutoff: None | Cursor = None,
+        page: None | ChatPage = None,
+        conditional: bool = True,
+) -> AsyncIterator[ChatMessage]:
+    """
+    Read the chat page and yield its messages, newest first.
+
+    Parsing stops at the first message older than the dedupe window of the
+    cutoff, so an idle page only costs the rows of the last minute.
+    Delivered messages within the window are skipped.
+
+    Args:
+        base_url: The base URL of the HLstats site.
+        game: The HLstats game code.
+        backend: The parser backend, the best available one by default.
+        cutoff: The cursor of the delivered messages.
+        page: The page to read and record the outcome in, the first page by default.
+            Older pages are always fetched in full.
+        conditional: Whether to skip the first page if it has not changed since the previous read.
+
+    Yields:
+        ChatMessage: The messages newer than the cutoff.
+    """
+    page = page or ChatPage()
+    url = f"{base_url}/stats/hlstats.php?mode=chat&game={game}"  # noqa
+    if page.number > 1:
+        url += f"&page={page.number}"
+    backend = backend or get_backend()
+    started = time.perf_counter()
+
+    try:
+        async with aclosing(stream_html_page(url, page, conditional=conditional and page.number == 1)) as chunks, \
+                aclosing(backend.parse_stream(chunks)) as rows:
+            async for row in rows:
+                page.rows += 1
+                message = build_message(row, base_url)
+                if cutoff is not None:
+                    if cutoff.behind(message):
+                        page.reached = True
+                        return
+                    if message.key in cutoff.seen:
+                        continue
+
+                paused = time.perf_counter()
+                yield message
+                started += time.perf_counter() - paused
+
+    except ParserError as e:
+        page.error = " ".join(map(str, e.args))
+        _validators.pop(url, None)  # the page was not read in full, so it is not seen yet
+
+    except Exception:
+        _validators.pop(url, None)
+        raise
+
+    finally:
+        page.parse_time = time.perf_counter() - started - page.fetch_time
+
+
+async def catch_up(
+        base_url: str,
+        game: str,
+        backend: ParserBackend,
+        cutoff: Cursor,
+        semaphore: asyncio.Semaphore,
+        window: int,
+        max_pages: int,
+) -> list[ChatMessage]:
+    """
+    Read the chat pages following the first one back to the cutoff.
+
+    Pages are fetched concurrently, ``window`` pages at a time, until a page
+    reaches the cutoff or comes back empty, or ``max_pages`` pages were read.
+    Rows that moved to the next page while reading are returned once.
+
+    Args:
+        base_url: The base URL of the HLstats site.
+        game: The HLstats game code.
+        backend: The parser backend.
+        cutoff: The cursor of the delivered messages.
+        semaphore: The semaphore bounding concurrent page fetches, shared by all sources.
+        window: The number of pages requested at once.
+        max_pages: The number of the last page to read.
+
+    Returns:
+        list: The new messages of the older pages, newest first.
+
+    Raises:
+        ParserError: If a page failed, so the gap is not partially filled.
+    """
+
+    async def read(number: int) -> tuple[ChatPage, list[ChatMessage]]:
+        page = ChatPage(number=number)
+        async with semaphore:
+            messages = [
+                message async for message in
+                parse_chat(base_url, game, backend=backend, cutoff=cutoff, page=page)
+            ]
+        return page, messages
+
+    messages: list[ChatMessage] = []
+    number = 2
+
+    while number <= max_pages:
+        numbers = range(number, min(max_pages, number + window - 1) + 1)
+        results = await asyncio.gather(*(read(number) for number in numbers))
+
+        for page, page_messages in results:
+            if page.failed:
+                raise ParserError(f"page {page.number}", page.error)
+            messages.extend(page_messages)
+            if page.reached or not page.rows:
+                return list(dict.fromkeys(messages))
+
+        number = numbers[-1] + 1
+
+    logging.warning("Catch-up of %s stopped after %d pages", base_url, max_pages)
+    return list(dict.fromkeys(messages))
@@ -0,0 +1,46 @@
+import random
+
+from typing import Callable
+
+
+class AdaptiveInterval:
+    """
+    Polling interval that drops to the minimum after activity and backs off
+    exponentially while the chat is idle.
+
+    Attributes:
+        FACTOR (float): The multiplier applied to the interval after an idle poll.
+        JITTER (float): The relative random spread added to every interval.
+    """
+    FACTOR = 2.0
+    JITTER = 0.1
+
+    def __init__(self, minimum: float, maximum: float, rand: Callable[[], float] = random.random) -> None:
+        """
+        Args:
+            minimum: The interval right after activity, in seconds.
+            maximum: The longest interval while idle, in seconds.
+            rand: A source of random numbers in [0, 1), for the jitter.
+        """
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.current = minimum
+
+        self._rand = rand
+
+    def next(self, active: bool) -> float:
+        """
+        Get the time to sleep before the next poll.
+
+        Args:
+            active: Whether the last poll found new messages.
+
+        Returns:
+            float: The interval in seconds.
+        """
+        if active:
+            self.current = self.minimum
+        else:
+            self.current = min(self.maximum, self.current * self.FACTOR)
+
+        return self.current * (1 + self.JITTER * (2 * self._rand() - 1))
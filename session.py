@@ -0,0 +1,54 @@
+import aiohttp
+
+
+class SessionDefaults:
+    """
+    Default settings of the HTTP client shared by all fetchers.
+
+    Attributes:
+        LIMIT (int): The total number of simultaneous connections in the pool.
+        LIMIT_PER_HOST (int): The number of simultaneous connections to a single host.
+        KEEPALIVE_TIMEOUT (float): Seconds an idle connection is kept open for reuse.
+        DNS_CACHE_TTL (int): Seconds a resolved host address is cached.
+        CHUNK_SIZE (int): The number of bytes read from a response at once.
+        MAX_BODY_SIZE (int): The number of bytes read from a page at most.
+        ENCODING (str): The encoding of pages whose response has no charset.
+        CONNECT_TIMEOUT (float): Seconds to wait for a connection from the pool and to the host.
+        READ_TIMEOUT (float): Seconds to wait for the next chunk of a response.
+        TOTAL_TIMEOUT (float): Seconds a whole request may take.
+    """
+    LIMIT = 100
+    LIMIT_PER_HOST = 4
+    KEEPALIVE_TIMEOUT = 60.0
+    DNS_CACHE_TTL = 600
+    CHUNK_SIZE = 16384
+    MAX_BODY_SIZE = 4 * 1024 * 1024
+    ENCODING = "utf-8"
+    CONNECT_TIMEOUT = 10.0
+    READ_TIMEOUT = 20.0
+    TOTAL_TIMEOUT = 60.0
+
+
+def create_session() -> aiohttp.ClientSession:
+    """
+    Create a long-lived HTTP client session with a keep-alive connection pool,
+    a DNS cache and request timeouts.
+
+    The session must be created inside a running event loop and closed on shutdown.
+
+    Returns:
+        aiohttp.ClientSession: The pooled client session.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=SessionDefaults.LIMIT,
+        limit_per_host=SessionDefaults.LIMIT_PER_HOST,
+        keepalive_timeout=SessionDefaults.KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=SessionDefaults.DNS_CACHE_TTL,
+        use_dns_cache=True,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=SessionDefaults.TOTAL_TIMEOUT,
+        connect=SessionDefaults.CONNECT_TIMEOUT,
+        sock_read=SessionDefaults.READ_TIMEOUT,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
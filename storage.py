@@ -0,0 +1,176 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+
+from parser import Cursor
+
+
+class StateStore:
+    """
+    Base class of the cursor stores.
+
+    Cursors live in memory: :meth:`save` only records the latest state of a
+    source, and :meth:`flush` writes all changed sources at once.
+    """
+
+    def __init__(self) -> None:
+        self._dirty: dict[str, dict] = {}
+
+    def load(self, name: str) -> Cursor:
+        """
+        Load the cursor of a source.
+
+        Args:
+            name: The source name.
+
+        Returns:
+            Cursor: The saved cursor, or an empty one.
+        """
+        raise NotImplementedError
+
+    def has(self, name: str) -> bool:
+        """
+        Check whether a cursor was saved under a name.
+
+        Args:
+            name: The source name.
+
+        Returns:
+            bool: True if the store holds a cursor of its own for the name.
+        """
+        raise NotImplementedError
+
+    def save(self, name: str, cursor: Cursor) -> None:
+        """
+        Record the cursor of a source, to be written on the next flush.
+
+        Args:
+            name: The source name.
+            cursor: The cursor of the delivered messages.
+        """
+        self._dirty[name] = cursor.dump()
+
+    def flush(self) -> None:
+        """
+        Write the recorded cursors.
+        """
+        if not self._dirty:
+            return
+
+        dirty, self._dirty = self._dirty, {}
+        try:
+            self._write(dirty)
+        except BaseException:
+            self._dirty = {**dirty, **self._dirty}
+            raise
+
+    def close(self) -> None:
+        """
+        Write the recorded cursors and release the store.
+        """
+        self.flush()
+
+    def _write(self, cursors: dict[str, dict]) -> None:
+        raise NotImplementedError
+
+
+class JsonStateStore(StateStore):
+    """
+    Cursor store in a JSON file, replaced atomically on every write.
+
+    The file keeps one entry per source under ``sources``. The top-level
+    entry of single-server files is used for sources without one, and an
+    empty or unreadable file is treated as having no cursors.
+    """
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
+        self.data = self._read()
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, "r") as f:
+                data = json.loads(f.read() or "{}")
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            logging.error("Ignoring unreadable state file %s: %s", self.path, e)
+            return {}
+
+        return data if isinstance(data, dict) else {}
+
+    def load(self, name: str) -> Cursor:
+        return Cursor.load(self.data.get("sources", {}).get(name, self.data))
+
+    def has(self, name: str) -> bool:
+        return name in self.data.get("sources", {})
+
+    def _write(self, cursors: dict[str, dict]) -> None:
+        self.data.setdefault("sources", {}).update(cursors)
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".state-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(json.dumps(self.data))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+class SqliteStateStore(StateStore):
+    """
+    Cursor store in an SQLite database with one row per source.
+    """
+
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS cursors (source TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        self.connection.commit()
+
+    def load(self, name: str) -> Cursor:
+        row = self.connection.execute("SELECT data FROM cursors WHERE source = ?", (name,)).fetchone()
+        return Cursor.load(json.loads(row[0]) if row else {})
+
+    def has(self, name: str) -> bool:
+        return self.connection.execute("SELECT 1 FROM cursors WHERE source = ?", (name,)).fetchone() is not None
+
+    def _write(self, cursors: dict[str, dict]) -> None:
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO cursors (source, data) VALUES (?, ?)",
+                [(name, json.dumps(data)) for name, data in cursors.items()],
+            )
+
+    def close(self) -> None:
+        super().close()
+        self.connection.close()
+
+
+def create_store(backend: str, path: str) -> StateStore:
+    """
+    Create a cursor store.
+
+    Args:
+        backend: ``json`` or ``sqlite``.
+        path: The path of the state file.
+
+    Returns:
+        StateStore: The store.
+    """
+    match backend:
+        case "json":
+            return JsonStateStore(path)
+        case "sqlite":
+            return SqliteStateStore(path)
+        case _:
+            raise ValueError(f"State backend {backend} is not supported.")
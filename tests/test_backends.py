@@ -0,0 +1,54 @@
+import asyncio
+
+from pathlib import Path
+from typing import AsyncIterator
+
+import pytest
+
+from backends import ChatRow, available_backends, get_backend
+
+FIXTURE = Path(__file__).parent.parent / "benchmarks" / "fixtures" / "chat.html"
+
+
+@pytest.fixture(scope="module")
+def html() -> str:
+    return FIXTURE.read_text(encoding="utf-8")
+
+
+@pytest.fixture(scope="module")
+def reference(html) -> list[ChatRow]:
+    return list(get_backend("soup").parse(html))
+
+
+async def chunked(text: str, size: int) -> AsyncIterator[str]:
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+def parse_stream(name: str, text: str, size: int) -> list[ChatRow]:
+    async def run() -> list[ChatRow]:
+        return [row async for row in get_backend(name).parse_stream(chunked(text, size))]
+
+    return asyncio.run(run())
+
+
+def test_reference_reads_the_fixture(reference):
+    assert len(reference) > 50
+    assert all(row.date and row.map for row in reference)
+
+
+@pytest.mark.parametrize("name", available_backends())
+def test_parse_matches_the_reference(name, html, reference):
+    assert list(get_backend(name).parse(html)) == reference
+
+
+@pytest.mark.parametrize("name", available_backends())
+@pytest.mark.parametrize("size", [1, 7, 100, 4093, 1 << 20])
+def test_parse_stream_matches_the_reference(name, size, html, reference):
+    assert parse_stream(name, html, size) == reference
+
+
+@pytest.mark.parametrize("name", available_backends())
+def test_empty_body_has_no_rows(name):
+    assert list(get_backend(name).parse("")) == []
+    assert parse_stream(name, "", 10) == []
@@ -0,0 +1,118 @@
+import json
+
+from parser import ChatMessage, Cursor, SeenSet, parse_timestamp
+
+
+def message(date: str, text: str = "hi", user: str = "1") -> ChatMessage:
+    return ChatMessage(
+        map="c1m1_hotel",
+        date=date,
+        text=text,
+        user_name=f"player {user}",
+        user_link=f"https://example.com/stats/hlstats.php?mode=playerinfo&player={user}",
+        user_country="🏳",
+        timestamp=parse_timestamp(date),
+    )
+
+
+def new(cursor: Cursor, messages: list[ChatMessage]) -> list[ChatMessage]:
+    # The filter of parse_chat and send_messages.
+    return [item for item in messages if not cursor.behind(item) and item.key not in cursor.seen]
+
+
+def deliver(cursor: Cursor, messages: list[ChatMessage]) -> None:
+    for item in messages:
+        cursor.advance(item)
+
+
+def test_same_second_messages_split_across_polls():
+    first = message("2023-06-20 08:00:00", "first")
+    second = message("2023-06-20 08:00:00", "second")
+    cursor = Cursor()
+
+    assert new(cursor, [first]) == [first]
+    deliver(cursor, [first])
+
+    assert new(cursor, [first, second]) == [second]
+    deliver(cursor, [second])
+
+    assert new(cursor, [first, second]) == []
+    assert cursor.date == "2023-06-20 08:00:00"
+
+
+def test_late_message_inside_the_window_is_new():
+    cursor = Cursor()
+    deliver(cursor, [message("2023-06-20 08:00:00", "a"), message("2023-06-20 08:00:30", "b")])
+
+    late = message("2023-06-20 08:00:10", "late")
+    assert new(cursor, [late]) == [late]
+
+    deliver(cursor, [late])
+    assert cursor.date == "2023-06-20 08:00:30"
+    assert new(cursor, [late]) == []
+
+
+def test_message_older_than_the_window_is_behind():
+    cursor = Cursor()
+    deliver(cursor, [message("2023-06-20 08:00:00")])
+
+    inside = message("2023-06-20 07:59:00", "inside")
+    outside = message("2023-06-20 07:58:59", "outside")
+
+    assert not cursor.behind(inside)
+    assert cursor.behind(outside)
+
+
+def test_seen_set_evicts_the_oldest_keys_at_max_size():
+    seen = SeenSet()
+    for key in range(SeenSet.MAX_SIZE + 1):
+        seen.add(key, 0)
+
+    assert len(seen) == SeenSet.MAX_SIZE
+    assert 0 not in seen
+    assert 1 in seen
+    assert SeenSet.MAX_SIZE in seen
+
+
+def test_advance_evicts_keys_before_the_horizon():
+    cursor = Cursor()
+    early = message("2023-06-20 08:00:00", "early")
+    deliver(cursor, [early, message("2023-06-20 08:01:01", "later")])
+
+    assert early.key not in cursor.seen
+    assert cursor.behind(early)
+
+
+def test_dump_load_round_trip():
+    cursor = Cursor()
+    messages = [message("2023-06-20 08:00:00", "a"), message("2023-06-20 08:00:20", "b")]
+    deliver(cursor, messages)
+
+    loaded = Cursor.load(json.loads(json.dumps(cursor.dump())))
+
+    assert loaded.date == cursor.date
+    assert loaded.timestamp == cursor.timestamp
+    assert loaded.horizon == cursor.horizon
+    assert loaded.seen.items() == cursor.seen.items()
+
+    late = message("2023-06-20 08:00:10", "late")
+    assert new(loaded, messages + [late]) == [late]
+
+
+def test_load_legacy_state_file():
+    cursor = Cursor.load({"last_date": "2023-06-20 08:00:00"})
+
+    assert cursor.date == "2023-06-20 08:00:00"
+    assert not cursor.seen
+    assert new(cursor, [message("2023-06-20 08:00:00")]) == []
+
+    later = message("2023-06-20 08:00:01")
+    assert new(cursor, [later]) == [later]
+
+
+def test_load_empty_state():
+    cursor = Cursor.load({})
+    item = message("2023-06-20 08:00:00")
+
+    assert cursor.date == ""
+    assert new(cursor, [item]) == [item]
@@ -0,0 +1,99 @@
+import asyncio
+
+from aiohttp import web
+from aiogram import Bot
+from aiogram.bot.api import TelegramAPIServer
+
+from delivery import Delivery, DeliveryQueue
+from limiter import RateLimiter
+
+TOKEN = "123456:TEST"
+
+
+def ok(data: dict) -> web.Response:
+    return web.json_response({
+        "ok": True,
+        "result": {
+            "message_id": 1,
+            "date": 0,
+            "chat": {"id": int(data["chat_id"]), "type": "supergroup"},
+            "text": data["text"],
+        },
+    })
+
+
+def error(status: int, description: str, **parameters) -> web.Response:
+    body = {"ok": False, "error_code": status, "description": description}
+    if parameters:
+        body["parameters"] = parameters
+    return web.json_response(body, status=status)
+
+
+def deliver(clock, responses: list) -> tuple[list[str], list[list]]:
+    """
+    Send one delivery through a Bot API stand-in answering with the given responses in turn.
+
+    Returns:
+        tuple: The texts of the sendMessage calls and the delivered callbacks.
+    """
+    calls, delivered = [], []
+
+    async def send_message(request: web.Request) -> web.Response:
+        data = await request.post()
+        calls.append(data["text"])
+        return responses[len(calls) - 1](data)
+
+    async def run() -> None:
+        app = web.Application()
+        app.router.add_post("/bot{token}/sendMessage", send_message)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # noqa
+
+        bot = Bot(TOKEN, server=TelegramAPIServer.from_base(f"http://127.0.0.1:{port}"))
+        limiter = RateLimiter(rate=100, chat_rate=100, chat_burst=100, clock=clock, sleep=clock.sleep)
+        queue = DeliveryQueue(bot, limiter, chat_id=-100, thread_id=None, on_delivered=delivered.append)
+        queue.BASE_DELAY = 0.0
+
+        worker = asyncio.create_task(queue.worker())
+        try:
+            queue.put_nowait([Delivery(text="hello")])
+            await asyncio.wait_for(queue.join(), 5)
+        finally:
+            worker.cancel()
+            await (await bot.get_session()).close()
+            await runner.cleanup()
+
+    asyncio.run(run())
+    return calls, delivered
+
+
+def test_server_error_is_retried(clock):
+    calls, delivered = deliver(clock, [lambda data: error(502, "Bad Gateway"), ok])
+
+    assert calls == ["hello", "hello"]
+    assert delivered == [[]]
+
+
+def test_restarting_telegram_is_retried(clock):
+    calls, delivered = deliver(clock, [lambda data: error(500, "Internal Server Error: restart"), ok])
+
+    assert len(calls) == 2
+    assert delivered == [[]]
+
+
+def test_retry_after_waits_and_retries(clock):
+    calls, delivered = deliver(clock, [lambda data: error(429, "Too Many Requests: retry after 3", retry_after=3), ok])
+
+    assert len(calls) == 2
+    assert delivered == [[]]
+    assert clock.now >= 3
+
+
+def test_rejected_message_is_dropped(clock):
+    calls, delivered = deliver(clock, [lambda data: error(400, "Bad Request: chat not found")])
+
+    assert len(calls) == 1
+    assert delivered == [[]]
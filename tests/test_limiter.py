@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+from limiter import RateLimiter, TokenBucket
+
+
+def acquire(limiter: RateLimiter, *keys) -> None:
+    async def run() -> None:
+        for key in keys:
+            await limiter.acquire(key)
+
+    asyncio.run(run())
+
+
+def test_bucket_allows_a_burst_up_to_its_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=3, clock=clock)
+
+    for _ in range(3):
+        assert bucket.delay() == 0
+        bucket.take()
+
+    assert bucket.delay() == pytest.approx(1.0)
+    clock.now += 0.5
+    assert bucket.delay() == pytest.approx(0.5)
+
+
+def test_bucket_refills_no_more_than_its_capacity(clock):
+    bucket = TokenBucket(rate=1, capacity=2, clock=clock)
+    bucket.take()
+    bucket.take()
+
+    clock.now += 100
+    bucket.delay()
+
+    assert bucket.tokens == 2
+
+
+def test_global_limit_spans_all_chats(clock):
+    limiter = RateLimiter(rate=2, chat_rate=100, chat_burst=100, clock=clock, sleep=clock.sleep)
+
+    acquire(limiter, 1, 2, 3, 4)
+
+    assert clock.now == pytest.approx(1.0)
+    assert sum(clock.sleeps) == pytest.approx(1.0)
+
+
+def test_chat_limit_applies_to_its_chat_only(clock):
+    limiter = RateLimiter(rate=100, chat_rate=1, chat_burst=1, clock=clock, sleep=clock.sleep)
+
+    acquire(limiter, 1, 2)
+    assert clock.now == 0
+
+    acquire(limiter, 1)
+    assert clock.now == pytest.approx(1.0)
+
+
+def test_chat_burst_goes_out_back_to_back(clock):
+    limiter = RateLimiter(rate=100, chat_rate=1, chat_burst=3, clock=clock, sleep=clock.sleep)
+
+    acquire(limiter, 1, 1, 1)
+    assert clock.sleeps == []
+
+    acquire(limiter, 1)
+    assert clock.now == pytest.approx(1.0)
+
+
+def test_retry_after_blocks_the_chat(clock):
+    limiter = RateLimiter(rate=100, chat_rate=10, chat_burst=10, clock=clock, sleep=clock.sleep)
+
+    limiter.retry_after(1, 5)
+    acquire(limiter, 2)
+    assert clock.now == 0
+
+    acquire(limiter, 1)
+    assert clock.now == pytest.approx(5.0)
+
+
+def test_retry_after_halves_the_chat_rate_down_to_the_minimum(clock):
+    limiter = RateLimiter(rate=100, chat_rate=8, chat_burst=1, clock=clock, sleep=clock.sleep)
+
+    limiter.retry_after(1, 1)
+    assert limiter.chat(1).rate == 4
+
+    for _ in range(10):
+        limiter.retry_after(1, 1)
+    assert limiter.chat(1).rate == 8 * TokenBucket.MIN_RATE_FACTOR
+
+    clock.now += 1
+    acquire(limiter, 1, 1)
+    assert clock.now == pytest.approx(2.0)
+
+
+def test_success_recovers_the_configured_rate(clock):
+    limiter = RateLimiter(rate=100, chat_rate=8, chat_burst=1, clock=clock, sleep=clock.sleep)
+    limiter.retry_after(1, 1)
+
+    limiter.success(1)
+    assert limiter.chat(1).rate == pytest.approx(4 * TokenBucket.RECOVERY_FACTOR)
+
+    for _ in range(20):
+        limiter.success(1)
+    assert limiter.chat(1).rate == 8
@@ -0,0 +1,200 @@
+import json
+import random
+import logging
+
+import aiohttp
+
+SERVICE_NAME = "hlstats-bot"
+
+
+class Span:
+    """
+    A timed step of the way of a chat message from the stats page to Telegram.
+
+    Attributes:
+        trace_id (str): The trace of the message, 32 hex digits.
+        span_id (str): The span id, 16 hex digits.
+        name (str): The step, e.g. ``fetch`` or ``send``.
+        start (float): The start time, in seconds since the epoch.
+        end (float): The end time, in seconds since the epoch.
+        attributes (dict): Details of the step.
+    """
+    __slots__ = ("trace_id", "span_id", "name", "start", "end", "attributes")
+
+    def __init__(self, trace_id: str, name: str, start: float, end: float, attributes: dict) -> None:
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64) or 1:016x}"
+        self.name = name
+        self.start = start
+        self.end = end
+        self.attributes = attributes
+
+    def dump(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "name": self.name,
+            "start_time_unix_nano": int(self.start * 1e9),
+            "end_time_unix_nano": int(self.end * 1e9),
+            "duration_ms": round((self.end - self.start) * 1000, 3),
+            "attributes": self.attributes,
+        }
+
+
+class SpanExporter:
+    """
+    Base class of the span exporters.
+    """
+
+    async def export(self, spans: list[Span]) -> None:
+        raise NotImplementedError
+
+
+class JsonlExporter(SpanExporter):
+    """
+    Appends spans to a file, one JSON object per line.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    async def export(self, spans: list[Span]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(span.dump(), ensure_ascii=False) + "\n" for span in spans)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpExporter(SpanExporter):
+    """
+    Posts spans to an OpenTelemetry collector in the OTLP/HTTP JSON encoding.
+    """
+
+    def __init__(self, endpoint: str, session: aiohttp.ClientSession) -> None:
+        """
+        Args:
+            endpoint: The traces URL of the collector, e.g. ``http://127.0.0.1:4318/v1/traces``.
+            session: The HTTP client session.
+        """
+        self.endpoint = endpoint
+        self.session = session
+
+    async def export(self, spans: list[Span]) -> None:
+        body = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                "scopeSpans": [{
+                    "scope": {"name": SERVICE_NAME},
+                    "spans": [
+                        {
+                            "traceId": span.trace_id,
+                            "spanId": span.span_id,
+                            "name": span.name,
+                            "kind": 1,
+                            "startTimeUnixNano": str(int(span.start * 1e9)),
+                            "endTimeUnixNano": str(int(span.end * 1e9)),
+                            "attributes": [
+                                {"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()
+                            ],
+                        }
+                        for span in spans
+                    ],
+                }],
+            }],
+        }
+        async with self.session.post(self.endpoint, json=body) as response:
+            response.raise_for_status()
+
+
+class Tracer:
+    """
+    Collects spans in memory and hands them to an exporter in batches.
+
+    Without an exporter tracing is disabled, and callers skip building spans.
+
+    Attributes:
+        MAX_PENDING (int): The number of spans kept while the exporter is failing.
+        BATCH_SIZE (int): The number of spans exported at once.
+    """
+    MAX_PENDING = 50000
+    BATCH_SIZE = 1000
+
+    def __init__(self, exporter: None | SpanExporter = None) -> None:
+        self.exporter = exporter
+        self.pending: list[Span] = []
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def record(self, trace_id: str, name: str, start: float, end: float, **attributes) -> None:
+        """
+        Record a finished span.
+
+        Args:
+            trace_id: The trace of the message.
+            name: The step.
+            start: The start time, in seconds since the epoch.
+            end: The end time, in seconds since the epoch.
+            **attributes: Details of the step.
+        """
+        if len(self.pending) >= self.MAX_PENDING:
+            self.dropped += 1
+            return
+        self.pending.append(Span(trace_id, name, start, end, attributes))
+
+    async def flush(self) -> None:
+        """
+        Export the recorded spans, keeping them for the next flush on failure.
+        """
+        if not self.enabled or not self.pending:
+            return
+
+        spans, self.pending = self.pending, []
+        for start in range(0, len(spans), self.BATCH_SIZE):
+            try:
+                await self.exporter.export(spans[start:start + self.BATCH_SIZE])
+            except (OSError, aiohttp.ClientError) as e:
+                logging.error("Failed to export %d spans: %s", len(spans) - start, e)
+                self.pending = (spans[start:] + self.pending)[-self.MAX_PENDING:]
+                break
+
+        if self.dropped:
+            logging.warning("Dropped %d spans while the exporter was behind", self.dropped)
+            self.dropped = 0
+
+
+tracer = Tracer()
+
+
+def create_exporter(kind: str, path: str, endpoint: str, session: aiohttp.ClientSession) -> None | SpanExporter:
+    """
+    Create a span exporter.
+
+    Args:
+        kind: ``none``, ``jsonl`` or ``otlp``.
+        path: The file of the ``jsonl`` exporter.
+        endpoint: The collector URL of the ``otlp`` exporter.
+        session: The HTTP client session of the ``otlp`` exporter.
+
+    Returns:
+        SpanExporter: The exporter, or None if tracing is disabled.
+    """
+    match kind:
+        case "none":
+            return None
+        case "jsonl":
+            return JsonlExporter(path)
+        case "otlp":
+            return OtlpExporter(endpoint, session)
+        case _:
+            raise ValueError(f"Trace exporter {kind} is not supported.")
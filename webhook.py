@@ -0,0 +1,56 @@
+import hmac
+
+from aiohttp import web
+from aiogram import Dispatcher
+from aiogram.dispatcher.webhook import get_new_configured_app
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def create_app(dp: Dispatcher, path: str, secret: str = "") -> web.Application:
+    """
+    Create the application receiving the updates of the bot from Telegram.
+
+    Args:
+        dp: The dispatcher handling the updates.
+        path: The path of the webhook.
+        secret: The token Telegram sends with every update, if any.
+
+    Returns:
+        web.Application: The application serving the webhook.
+    """
+    app = get_new_configured_app(dp, path)
+
+    if secret:
+        @web.middleware
+        async def check_secret(request: web.Request, handler):
+            if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), secret):
+                raise web.HTTPUnauthorized()
+            return await handler(request)
+
+        app.middlewares.append(check_secret)
+
+    return app
+
+
+async def start_webhook(dp: Dispatcher, url: str, host: str, port: int, path: str, secret: str = "") -> web.AppRunner:
+    """
+    Start serving the webhook and register it with Telegram.
+
+    Args:
+        dp: The dispatcher handling the updates.
+        url: The public URL Telegram sends the updates to.
+        host: The address to listen on.
+        port: The port to listen on.
+        path: The path of the webhook.
+        secret: The token Telegram sends with every update, if any.
+
+    Returns:
+        web.AppRunner: The runner, to be cleaned up on shutdown.
+    """
+    runner = web.AppRunner(create_app(dp, path, secret), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+
+    await dp.bot.set_webhook(url, secret_token=secret or None)
+    return runner